@@ -0,0 +1,129 @@
+import base64
+import json
+import re
+import time
+from selenium.common.exceptions import WebDriverException
+
+# 長時間保持連線的請求不會結束，不列入進行中的請求
+LONG_LIVED_TYPES = ('EventSource', 'WebSocket', 'Ping')
+
+# 追蹤中／粉絲對話框分頁時呼叫的 API
+FRIENDSHIPS_API = re.compile(r'/api/v1/friendships/(\d+)/(following|followers)/')
+
+
+class CapturedPage:
+    """一次分頁請求回傳的帳號"""
+
+    def __init__(self, kind, users, next_max_id):
+        self.kind = kind
+        self.users = users              # [{'id', 'username', 'followed_by'}]
+        self.next_max_id = next_max_id  # 沒有下一頁時為 None
+
+
+def parse_friendships_page(kind, data):
+    """解析 friendships API 的 JSON；followed_by 只在回應包含 friendship_status 時才有值"""
+    users = []
+    for user in data.get('users') or []:
+        username = user.get('username')
+        if not username:
+            continue
+        user_id = user.get('pk') or user.get('pk_id') or user.get('id')
+        friendship = user.get('friendship_status') or {}
+        followed_by = friendship.get('followed_by')
+        users.append({
+            'id': str(user_id) if user_id else None,
+            'username': username,
+            'followed_by': bool(followed_by) if followed_by is not None else None,
+        })
+    return CapturedPage(kind, users, data.get('next_max_id') or None)
+
+
+class NetworkCapture:
+    """從 Chrome 的效能記錄（CDP Network 事件）統計傳輸量；lists 為 True 時另外讀取對話框分頁的 API 回應
+
+    效能記錄讀取後就會從瀏覽器端清除，兩種用途必須共用同一個讀取者。
+    """
+
+    def __init__(self, driver, logger=None, lists=True):
+        self.driver = driver
+        self.logger = logger
+        self.lists = lists
+        self.pending = {}   # requestId -> kind，等待回應載入完成
+        self.pages = []
+        self.bytes_received = 0  # Network.loadingFinished 回報的 encodedDataLength 總和
+        self.responses = 0
+        self.inflight = set()    # 已送出但尚未結束的請求
+        self.last_activity = time.monotonic()
+
+    def reset(self):
+        """統計目前累積記錄的傳輸量後丟棄，之後只擷取新的請求"""
+        self.poll(read_bodies=False)
+        self.pending.clear()
+        self.pages = []
+        self.inflight.clear()
+
+    def idle_for(self):
+        """沒有進行中的請求時回傳距離最後一次網路活動的秒數，否則回傳 0"""
+        if self.inflight:
+            return 0.0
+        return time.monotonic() - self.last_activity
+
+    def take_transfer(self):
+        """取出上次取出後累計的 (位元組數, 回應數)"""
+        transfer = (self.bytes_received, self.responses)
+        self.bytes_received = self.responses = 0
+        return transfer
+
+    def poll(self, read_bodies=True):
+        """讀取新的效能記錄並累計傳輸量，回傳新取得的分頁數"""
+        new_pages = 0
+        for entry in self.driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            params = message.get('params', {})
+            if method in ('Network.requestWillBeSent', 'Network.loadingFinished', 'Network.loadingFailed'):
+                self.last_activity = time.monotonic()
+
+            if method == 'Network.requestWillBeSent':
+                if params.get('type') not in LONG_LIVED_TYPES:
+                    self.inflight.add(params.get('requestId'))
+            elif method == 'Network.responseReceived' and self.lists:
+                response = params.get('response', {})
+                match = FRIENDSHIPS_API.search(response.get('url', ''))
+                if match and response.get('status') == 200:
+                    self.pending[params['requestId']] = match.group(2)
+            elif method == 'Network.loadingFinished':
+                self.inflight.discard(params.get('requestId'))
+                self.bytes_received += int(params.get('encodedDataLength') or 0)
+                self.responses += 1
+                kind = self.pending.pop(params.get('requestId'), None)
+                if kind and read_bodies:
+                    page = self._read_page(kind, params['requestId'])
+                    if page:
+                        self.pages.append(page)
+                        new_pages += 1
+            elif method == 'Network.loadingFailed':
+                self.inflight.discard(params.get('requestId'))
+                self.pending.pop(params.get('requestId'), None)
+        return new_pages
+
+    def _read_page(self, kind, request_id):
+        try:
+            body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            text = body['body']
+            if body.get('base64Encoded'):
+                text = base64.b64decode(text).decode('utf-8')
+            return parse_friendships_page(kind, json.loads(text))
+        except (WebDriverException, KeyError, ValueError) as e:
+            if self.logger:
+                self.logger.warning(f"無法讀取 API 回應: {str(e)}")
+            return None
+
+    def take(self, kind):
+        """取出指定名單已擷取的分頁"""
+        pages = [page for page in self.pages if page.kind == kind]
+        self.pages = [page for page in self.pages if page.kind != kind]
+        return pages
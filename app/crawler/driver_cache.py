@@ -0,0 +1,119 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+from webdriver_manager.chrome import ChromeDriverManager
+
+# 常見的 Chrome 執行檔位置
+CHROME_BINARIES = [
+    'google-chrome',
+    'google-chrome-stable',
+    'chromium',
+    'chromium-browser',
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+]
+
+VERSION_PATTERN = re.compile(r'(\d+)\.\d+\.\d+(?:\.\d+)?')
+
+
+def detect_binary_version(path):
+    """執行 <path> --version 取得主版本號，失敗時回傳 None"""
+    try:
+        output = subprocess.run(
+            [path, '--version'], capture_output=True, text=True, timeout=10
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = VERSION_PATTERN.search(output)
+    return match.group(1) if match else None
+
+
+def detect_chrome_version():
+    """從本機 Chrome 執行檔取得主版本號，找不到時回傳 None"""
+    for binary in CHROME_BINARIES:
+        path = binary if os.path.isabs(binary) else shutil.which(binary)
+        if not path or not os.path.exists(path):
+            continue
+        version = detect_binary_version(path)
+        if version:
+            return version
+    return None
+
+
+class DriverCache:
+    """依 Chrome 主版本將下載的 ChromeDriver 複製到快取目錄，避免每次啟動都查詢網路"""
+
+    def __init__(self, cache_dir, offline=False, logger=None):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        self.offline = offline
+        self.logger = logger
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, manifest):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.info(message)
+
+    def _path(self, entry):
+        """清單中記錄的是相對於快取目錄的路徑；舊版記錄的絕對路徑照原樣使用"""
+        return os.path.join(self.cache_dir, entry)
+
+    def _newest(self, manifest):
+        """最新版本且檔案仍存在的快取路徑"""
+        existing = [
+            self._path(entry) for _, entry in sorted(manifest.items(), key=lambda item: int(item[0]))
+            if os.path.exists(self._path(entry))
+        ]
+        return existing[-1] if existing else None
+
+    def _store(self, manifest, version, downloaded):
+        """將下載的 ChromeDriver 複製到 <快取目錄>/<主版本>/，只保存快取目錄就能離線使用"""
+        version = version or detect_binary_version(downloaded)
+        if not version:
+            return downloaded
+        entry = os.path.join(version, os.path.basename(downloaded))
+        target = self._path(entry)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(downloaded, target + '.tmp')
+        os.chmod(target + '.tmp', 0o755)
+        os.replace(target + '.tmp', target)
+        manifest[version] = entry
+        self._save(manifest)
+        return target
+
+    def resolve(self):
+        """回傳可用的 ChromeDriver 路徑"""
+        manifest = self._load()
+        version = detect_chrome_version()
+
+        cached = self._path(manifest[version]) if version and version in manifest else None
+        if cached and os.path.exists(cached):
+            self._log(f"使用快取的 ChromeDriver (Chrome {version})")
+            return cached
+
+        # 無法判斷版本時先使用最近一次快取的版本，不必每次都下載
+        if not version:
+            newest = self._newest(manifest)
+            if newest:
+                self._log("無法判斷 Chrome 版本，使用最新的快取 ChromeDriver")
+                return newest
+
+        if self.offline:
+            raise RuntimeError(f"離線模式下找不到 Chrome {version or '未知版本'} 的 ChromeDriver 快取")
+
+        self._log(f"下載 Chrome {version or '未知版本'} 對應的 ChromeDriver")
+        return self._store(manifest, version, ChromeDriverManager().install())
@@ -1,27 +1,104 @@
 import time
 import sys
+import os
+import json
 import logging
+import re
+from urllib.parse import urlparse
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException, StaleElementReferenceException, InvalidSessionIdException, NoSuchWindowException, WebDriverException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
-from webdriver_manager.chrome import ChromeDriverManager
+from app.crawler.capture import NetworkCapture
+from app.crawler.driver_cache import DriverCache
+from app.crawler.metrics import RunMetrics
+from app.crawler.ratelimit import RateLimiter
+from app.crawler.waits import AdaptiveWaiter
+
+# 追蹤清單對話框中的帳號連結
+DIALOG_LINKS = "div[role='dialog'] a[role='link']"
+DEFAULT_BASE_URL = 'https://www.instagram.com/'
+# 自己個人頁面上可以開啟的名單對話框
+LIST_LABELS = {'following': '追蹤中', 'followers': '粉絲'}
+
+# 個人頁面上大數量的縮寫單位，例如 1.2萬、12.5K
+COUNT_UNITS = {'k': 1_000, 'm': 1_000_000, '千': 1_000, '萬': 10_000, '万': 10_000, '億': 100_000_000, '亿': 100_000_000}
+COUNT_PATTERN = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*([kKmM千萬万億亿])?')
+
+# 精簡瀏覽器設定：爬蟲只需要頁面結構，不載入圖片、影音與字型
+LEAN_WINDOW_SIZE = '1280,800'
+LEAN_ARGUMENTS = [
+    '--blink-settings=imagesEnabled=false',
+    '--autoplay-policy=user-gesture-required',
+    '--mute-audio',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-features=Translate,MediaRouter,OptimizationHints',
+]
+LEAN_PREFS = {
+    'profile.managed_default_content_settings.images': 2,
+    'profile.default_content_setting_values.notifications': 2,
+}
+# Network.setBlockedURLs 以萬用字元比對完整網址，CDN 網址後面帶有查詢字串
+LEAN_BLOCKED_URLS = [
+    '*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.heic*', '*.ico*',
+    '*.mp4*', '*.m4a*', '*.m4s*', '*.m4v*', '*.webm*', '*.mp3*',
+    '*.woff*', '*.ttf*', '*.otf*',
+]
+
+
+def parse_count(text):
+    """解析個人頁面上的數量文字，回傳 (數量, 是否為精確值)；縮寫的數量只是近似值，無法解析時數量為 None"""
+    match = COUNT_PATTERN.search(text or '')
+    if not match:
+        return None, False
+    number, unit = match.groups()
+    number = number.replace(',', '')
+    if unit:
+        return int(float(number) * COUNT_UNITS[unit.lower()]), False
+    if '.' in number:
+        return int(float(number)), False
+    return int(number), True
+
 
 class InstagramCrawler:
     def __init__(self, config):
         self.config = config
         self.driver = None
+        self.waiter = None
+        self.startup_timings = {}
+        self.list_totals = {}  # 個人頁面上的追蹤中／粉絲人數，只記錄精確值，縮寫的人數為 None
+        self.capture = None  # 讀取效能記錄：統計傳輸量，網路擷取模式下另外讀取 API 回應
+        self.current_page = None  # 目前頁面的 (網址, 載入秒數)，離開時記錄傳輸量
+        self.captured_users = {}  # 網路擷取取得的帳號 {kind: {username: {'id', 'username', 'followed_by'}}}
+        self.metrics = RunMetrics()  # 由呼叫端替換成本次執行共用的實例
+        self._scroll_container = None  # (對話框 id, 滾動容器) 快取
         self.logger = logging.getLogger(__name__)
         self.setup_logger()
 
+        # 可指向本機的模擬伺服器進行離線測試
+        base_url = self.config['INSTAGRAM_BASE_URL'] if 'INSTAGRAM_BASE_URL' in self.config else None
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip('/') + '/'
+        self.site_host = urlparse(self.base_url).netloc.removeprefix('www.')
+
+        # 兩次頁面造訪之間的最小間隔
+        delay = self.config['DELAY_BETWEEN_REQUESTS'] if 'DELAY_BETWEEN_REQUESTS' in self.config else 0
+        self.rate_limiter = RateLimiter(delay)
+
     def setup_logger(self):
         """設定日誌"""
         log_level = self.config['LOG_LEVEL'] if 'LOG_LEVEL' in self.config else 'INFO'
         self.logger.setLevel(getattr(logging, log_level))
+
+        # 多個爬蟲實例共用同一個 logger，避免重複加入處理器
+        if self.logger.handlers:
+            return
         
         # 檔案處理器
         log_file = self.config['LOG_FILE'] if 'LOG_FILE' in self.config else 'logs/app.log'
@@ -48,23 +125,65 @@ class InstagramCrawler:
             chrome_options.add_argument('--disable-dev-shm-usage')
             chrome_options.add_argument('--disable-notifications')
             chrome_options.add_argument('--lang=zh-TW')
-            chrome_options.add_argument('--window-size=1920,1080')
+
+            # 精簡模式：較小的視窗並停用圖片與不需要的功能
+            lean = (self.config['BROWSER_PROFILE'] if 'BROWSER_PROFILE' in self.config else 'lean') == 'lean'
+            if lean:
+                chrome_options.add_argument(f'--window-size={LEAN_WINDOW_SIZE}')
+                for argument in LEAN_ARGUMENTS:
+                    chrome_options.add_argument(argument)
+                chrome_options.add_experimental_option('prefs', LEAN_PREFS)
+                self.logger.info("使用精簡瀏覽器設定")
+            else:
+                chrome_options.add_argument('--window-size=1920,1080')
+
+            # 效能記錄中的 Network 事件用來統計傳輸量，網路擷取模式也從中讀取 API 回應
+            capture_mode = self.config['CAPTURE_MODE'] if 'CAPTURE_MODE' in self.config else 'dom'
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+            # 使用固定的使用者資料目錄保存登入狀態
+            user_data_dir = self.config['CHROME_USER_DATA_DIR'] if 'CHROME_USER_DATA_DIR' in self.config else None
+            if user_data_dir:
+                chrome_options.add_argument(f'--user-data-dir={os.path.abspath(user_data_dir)}')
+                self.logger.info(f"使用瀏覽器資料目錄: {user_data_dir}")
 
             # 處理 ChromeDriver 路徑
+            start = time.perf_counter()
             chrome_driver_path = self.config.get('CHROME_DRIVER_PATH', None)
             if chrome_driver_path and chrome_driver_path.strip() and chrome_driver_path != '# 可選，預設自動下載':
                 self.logger.info("使用指定的 ChromeDriver")
                 service = Service(chrome_driver_path)
             else:
-                self.logger.info("自動下載並使用最新版本的 ChromeDriver")
-                service = Service(ChromeDriverManager().install())
+                cache = DriverCache(
+                    self.config.get('DRIVER_CACHE_DIR', os.path.join('data', 'drivers')),
+                    offline=self.config.get('DRIVER_OFFLINE', False),
+                    logger=self.logger
+                )
+                service = Service(cache.resolve())
+            self.startup_timings['driver_resolve'] = time.perf_counter() - start
 
+            start = time.perf_counter()
             self.driver = webdriver.Chrome(
                 service=service,
                 options=chrome_options
             )
+            self.startup_timings['browser_launch'] = time.perf_counter() - start
+            self.logger.info(
+                f"ChromeDriver 解析耗時 {self.startup_timings['driver_resolve']:.2f}s，"
+                f"瀏覽器啟動耗時 {self.startup_timings['browser_launch']:.2f}s"
+            )
             
-            self.driver.implicitly_wait(10)
+            # 所有等待都由 AdaptiveWaiter 明確處理；隱含等待會讓每次輪詢最多卡住數秒，使等待預算失效
+            self.driver.implicitly_wait(0)
+            if lean:
+                # 影音與字型沒有對應的內容設定，改在網路層直接封鎖
+                self.driver.execute_cdp_cmd('Network.enable', {})
+                self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS})
+            budgets = self.config['WAIT_BUDGETS'] if 'WAIT_BUDGETS' in self.config else None
+            self.waiter = AdaptiveWaiter(self.driver, budgets)
+            self.capture = NetworkCapture(self.driver, self.logger, lists=capture_mode == 'network')
+            if capture_mode == 'network':
+                self.logger.info("使用網路擷取模式蒐集名單")
             self.logger.info("瀏覽器初始化完成")
             return self.driver
             
@@ -72,15 +191,103 @@ class InstagramCrawler:
             self.logger.error(f"初始化瀏覽器失敗: {str(e)}")
             raise
 
+    def profile_url(self, username):
+        return f"{self.base_url}{username}/"
+
+    def navigate(self, url):
+        """遵守請求間隔後開啟頁面，等待 DOM 載入完成並記錄載入時間"""
+        self.rate_limiter.wait()
+        # 結算上一個頁面，同時清空瀏覽器端累積的記錄
+        self.finish_page()
+        start = time.perf_counter()
+        self.driver.get(url)
+        try:
+            self.waiter.dom_ready('navigate')
+        except TimeoutException:
+            self.logger.warning(f"頁面載入逾時: {url}")
+        # 單頁應用程式在 DOM 載入後仍會以 API 載入內容
+        self.waiter.network_idle('idle', self.capture)
+        elapsed = time.perf_counter() - start
+        self.metrics.incr('navigations')
+        self.metrics.add_time('page_load', elapsed)
+        self.current_page = (url, elapsed)
+
+    def finish_page(self):
+        """記錄目前頁面開啟後傳輸的位元組數
+
+        單頁應用程式在 DOM 載入完成後仍會持續載入 API 與延遲載入的內容，
+        因此以離開頁面時 CDP Network.loadingFinished 的 encodedDataLength 總和計算。
+        """
+        if not self.capture:
+            return
+        try:
+            self.capture.reset()
+        except WebDriverException:
+            pass
+        received, responses = self.capture.take_transfer()
+        self.metrics.incr('bytes', received)
+        if self.current_page:
+            url, elapsed = self.current_page
+            self.logger.info(f"頁面 {url}: 載入 {elapsed:.2f}s，傳輸 {received / 1024:.0f} KB（{responses} 個回應）")
+        self.current_page = None
+
+    def is_logged_in(self):
+        """以 sessionid cookie 和登入表單是否存在快速判斷登入狀態"""
+        if not self.driver.get_cookie('sessionid'):
+            return False
+        return self.waiter.count("input[name='username']") == 0
+
+    def restore_session(self):
+        """嘗試沿用瀏覽器資料目錄或已保存的 cookies，成功則不需重新登入"""
+        try:
+            if 'CHROME_USER_DATA_DIR' in self.config and self.config['CHROME_USER_DATA_DIR']:
+                self.navigate(self.base_url)
+            else:
+                session_file = self.config['SESSION_FILE'] if 'SESSION_FILE' in self.config else None
+                if not session_file or not os.path.exists(session_file):
+                    return False
+                with open(session_file, 'r', encoding='utf-8') as f:
+                    self.import_cookies(json.load(f))
+
+            if self.is_logged_in():
+                self.logger.info("沿用已保存的登入狀態")
+                return True
+
+            self.logger.info("保存的登入狀態已失效，重新登入")
+            self.driver.delete_all_cookies()
+            return False
+
+        except Exception as e:
+            self.logger.warning(f"無法沿用登入狀態: {str(e)}")
+            return False
+
+    def save_session(self):
+        """保存目前的登入 cookies 供下次執行使用"""
+        session_file = self.config['SESSION_FILE'] if 'SESSION_FILE' in self.config else None
+        if not session_file or not self.driver.get_cookie('sessionid'):
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(session_file)), exist_ok=True)
+            # cookies 等同登入憑證，只允許擁有者讀寫
+            fd = os.open(session_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.export_cookies(), f)
+            self.logger.info("已保存登入狀態")
+        except OSError as e:
+            self.logger.warning(f"保存登入狀態失敗: {str(e)}")
+
     def login(self):
         """登入 Instagram"""
         try:
+            if self.restore_session():
+                return True
+
             self.logger.info("開始登入 Instagram...")
-            self.driver.get("https://www.instagram.com/")
-            time.sleep(3)
+            self.navigate(self.base_url)
 
             self.logger.info("等待登入表單出現...")
-            username_input = WebDriverWait(self.driver, 10).until(
+            username_input = self.waiter.until(
+                'login',
                 EC.presence_of_element_located((By.CSS_SELECTOR, "input[name='username']"))
             )
             self.logger.info("找到使用者名稱輸入框")
@@ -102,10 +309,16 @@ class InstagramCrawler:
             login_button = self.driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
             self.logger.info("點擊登入按鈕")
             login_button.click()
-            
-            time.sleep(5)
+
+            # 登入表單消失即代表已送出並跳轉
             try:
-                not_now_button = WebDriverWait(self.driver, 5).until(
+                self.waiter.until('login', EC.staleness_of(username_input))
+            except TimeoutException:
+                self.logger.warning("等待登入跳轉逾時")
+
+            try:
+                not_now_button = self.waiter.until(
+                    'popup',
                     EC.presence_of_element_located((By.CSS_SELECTOR, "button._a9--._ap36._a9_1"))
                 )
                 self.logger.info("點擊「稍後再試」按鈕")
@@ -114,204 +327,328 @@ class InstagramCrawler:
                 self.logger.info("沒有出現額外的彈窗")
                 
             self.logger.info("登入成功")
+            self.save_session()
             return True
             
         except Exception as e:
             self.logger.error(f"登入失敗: {str(e)}")
             return False
 
+    def export_cookies(self):
+        """匯出目前登入狀態的 cookies"""
+        return self.driver.get_cookies()
+
+    def import_cookies(self, cookies):
+        """匯入其他工作階段或已保存的 cookies 以共用登入狀態"""
+        self.navigate(self.base_url)
+        for cookie in cookies:
+            cookie = {
+                key: value for key, value in cookie.items()
+                if key in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expiry')
+            }
+            if 'expiry' in cookie:
+                cookie['expiry'] = int(cookie['expiry'])
+            self.driver.add_cookie(cookie)
+        self.driver.refresh()
+        self.waiter.dom_ready('navigate')
+
+    def find_scroll_container(self, dialog):
+        """單次掃描找出對話框中的滾動容器，並快取元素參照"""
+        cached = self._scroll_container
+        if cached and cached[0] == dialog.id:
+            return cached[1]
+
+        container = self.driver.execute_script("""
+            const dialog = arguments[0];
+            let best = null;
+            for (const div of dialog.querySelectorAll('div')) {
+                // 先用較便宜的尺寸判斷過濾，再檢查樣式
+                if (div.scrollHeight <= div.clientHeight) continue;
+                if (best && div.scrollHeight <= best.scrollHeight) continue;
+                const overflowY = window.getComputedStyle(div).overflowY;
+                if (overflowY === 'auto' || overflowY === 'scroll') best = div;
+            }
+            return best;
+        """, dialog)
+        if container:
+            self._scroll_container = (dialog.id, container)
+        return container
+
     def scroll_dialog(self):
-        """使用 JavaScript 滾動對話框直到沒有新內容"""
-        try:
-            # 等待對話框和滾動容器出現
-            dialog = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div[role='dialog']"))
-            )
-            time.sleep(3)  # 等待內容載入
+        """使用 JavaScript 滾動對話框直到沒有新內容，邊滾動邊回傳新出現的帳號"""
+        # 等待對話框和滾動容器出現
+        dialog = self.waiter.until(
+            'dialog',
+            EC.presence_of_element_located((By.CSS_SELECTOR, "div[role='dialog']"))
+        )
+        self.waiter.count_stable('rows', DIALOG_LINKS)  # 等待內容載入
 
-            no_change_count = 0
-            prev_count = 0
-            attempt = 0
-            
-            while True:
-                attempt += 1
-                self.logger.info(f"執行第 {attempt} 次滾動")
-                
-                # 執行滾動和獲取結果
-                # 執行滾動和獲取結果
-                scroll_result = self.driver.execute_script("""
-                    const dialog = arguments[0];
-                    
-                    // 尋找所有可能的滾動容器
-                    const allContainers = Array.from(dialog.querySelectorAll('div'));
-                    const scrollContainers = allContainers.filter(div => {
-                        const style = window.getComputedStyle(div);
-                        const hasScroll = style.overflowY === 'auto' || style.overflowY === 'scroll';
-                        const hasContent = div.scrollHeight > div.clientHeight;
-                        return hasScroll && hasContent;
-                    });
-                    
-                    // 按照容器大小排序
-                    scrollContainers.sort((a, b) => b.scrollHeight - a.scrollHeight);
-                    
-                    // 記錄診斷信息
-                    console.log('找到的滾動容器:', scrollContainers.map(c => ({
-                        class: c.className,
-                        height: c.scrollHeight,
-                        visible: c.clientHeight
-                    })));
-                    
-                    // 選擇最合適的容器
-                    const container = scrollContainers[0];
-                    if (!container) {
-                        return { success: false, error: 'No suitable scroll container found' };
-                    }
-                    
-                    // 執行滾動
-                    const oldScrollTop = container.scrollTop;
-                    container.scrollTop += 500;
-                    
-                    return {
-                        success: true,
-                        container: container.className,
-                        itemCount: dialog.querySelectorAll('a[role="link"]').length,
-                        oldHeight: oldScrollTop,
-                        newHeight: container.scrollTop,
-                        scrollHeight: container.scrollHeight,
-                        clientHeight: container.clientHeight
-                    };
-                """, dialog)
-                    
-                if not scroll_result.get('success'):
-                    self.logger.error(f"滾動錯誤: {scroll_result.get('error')}")
-                    return False
-                    
-                current_count = scroll_result['itemCount']
-                new_height = scroll_result['newHeight']
-                container_type = scroll_result.get('container', 'unknown')
-                
-                self.logger.info(f"使用容器類型: {container_type}, 當前項目數: {current_count}")
-                
-                if current_count > prev_count:
-                    self.logger.info(f"發現新項目: {current_count - prev_count} 個")
-                    no_change_count = 0
-                    prev_count = current_count
-                else:
-                    no_change_count += 1
-                    self.logger.info(f"沒有新項目 ({no_change_count}/3)")
-                
-                if no_change_count >= 3:
-                    self.logger.info("執行最終滾動檢查")
-                    self.driver.execute_script("""
-                        const scroll_box = arguments[0].querySelector('div._aano');
-                        if (scroll_box) {
-                            scroll_box.scrollTop = scroll_box.scrollHeight;
+        # 非同步腳本要能等滿一次滾動的時間預算
+        step_timeout = self.waiter.budget('scroll')
+        self.driver.set_script_timeout(step_timeout + 5)
+
+        no_change_count = 0
+        attempt = 0
+        final_check = False
+        final_scrolled = False
+
+        while True:
+            attempt += 1
+            self.metrics.incr('scroll_iterations')
+            self.logger.info(f"執行第 {attempt} 次滾動")
+
+            container = self.find_scroll_container(dialog)
+            if not container:
+                # 清單很短時不會出現滾動容器，直接收集目前的項目
+                if attempt > 1:
+                    raise RuntimeError("滾動錯誤: No suitable scroll container found")
+                yield from self.driver.execute_script(
+                    "return Array.from(arguments[0].querySelectorAll('a[role=\"link\"]'))"
+                    ".map(link => link.href).filter(Boolean)"
+                    ".map(href => new URL(href).pathname.split('/').filter(Boolean))"
+                    ".filter(parts => parts.length && !['following', 'followers'].includes(parts[parts.length - 1]))"
+                    ".map(parts => parts[parts.length - 1]);",
+                    dialog
+                )
+                break
+
+            # 同一次呼叫內收集、滾動並等待新列出現，只回傳差異
+            try:
+                with self.waiter.timed('scroll'):
+                    scroll_result = self.driver.execute_async_script("""
+                        const [dialog, container, toBottom, timeoutMs, done] = arguments;
+
+                        // 收集尚未回傳過的帳號；即使清單虛擬化移除畫面外的列也不會遺漏
+                        const seen = dialog.__harvested || (dialog.__harvested = new Set());
+                        const usernames = [];
+                        const harvest = () => {
+                            let found = 0;
+                            for (const link of dialog.querySelectorAll('a[role="link"]')) {
+                                const href = link.href;
+                                if (!href || seen.has(href)) continue;
+                                seen.add(href);
+                                // 略過對話框本身的追蹤中／粉絲連結
+                                const parts = new URL(href).pathname.split('/').filter(Boolean);
+                                if (parts.length && !['following', 'followers'].includes(parts[parts.length - 1])) {
+                                    usernames.push(parts[parts.length - 1]);
+                                    found++;
+                                }
+                            }
+                            return found;
+                        };
+                        harvest();
+
+                        let finished = false;
+                        const finish = (timedOut) => {
+                            if (finished) return;
+                            finished = true;
+                            observer.disconnect();
+                            clearTimeout(timer);
+                            harvest();
+                            done({ usernames, harvested: seen.size, timedOut });
+                        };
+
+                        // 新的列插入時立即返回，不再固定等待
+                        const observer = new MutationObserver(() => {
+                            if (harvest() > 0) finish(false);
+                        });
+                        observer.observe(container, { childList: true, subtree: true });
+                        const timer = setTimeout(() => finish(true), timeoutMs);
+
+                        if (toBottom) {
+                            container.scrollTop = container.scrollHeight;
+                        } else {
+                            container.scrollTop += container.clientHeight || 500;
                         }
-                    """, dialog)
-                    time.sleep(3)
+                    """, dialog, container, final_check, int(step_timeout * 1000))
+            except StaleElementReferenceException:
+                # 容器被重新渲染，下一輪重新尋找
+                self._scroll_container = None
+                continue
+
+            new_usernames = scroll_result.get('usernames', [])
+            yield from new_usernames
+            self.logger.info(f"已收集項目數: {scroll_result['harvested']}")
+
+            # 最終檢查：先滾到底部，下一輪收集完最後載入的項目後結束
+            if final_check:
+                if final_scrolled:
                     break
-                
-                # 等待內容載入
-                wait_time = 1.5
-                time.sleep(wait_time)
-                
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"滾動過程錯誤: {str(e)}")
-            return False
+                final_scrolled = True
+            elif new_usernames:
+                self.logger.info(f"發現新項目: {len(new_usernames)} 個")
+                no_change_count = 0
+            else:
+                no_change_count += 1
+                self.logger.info(f"沒有新項目 ({no_change_count}/3)")
+
+            if no_change_count >= 3 and not final_check:
+                self.logger.info("執行最終滾動檢查")
+                final_check = True
 
     def get_following_list(self):
         """獲取追蹤清單"""
+        return self.get_user_list('following')
+
+    def get_followers_list(self):
+        """獲取粉絲清單（追蹤我的帳號）"""
+        return self.get_user_list('followers')
+
+    def read_list_count(self, list_link):
+        """讀取名單連結上的人數；縮寫顯示時優先使用 title 屬性中的完整數字"""
+        count, exact = parse_count(list_link.text)
+        if count is None or not exact:
+            for element in list_link.find_elements(By.XPATH, ".//*[@title]"):
+                title_count, title_exact = parse_count(element.get_attribute('title'))
+                if title_exact:
+                    return title_count, True
+        return count, exact
+
+    def get_user_list(self, kind):
+        """從自己的個人頁面開啟追蹤中或粉絲對話框，滾動蒐集完整名單"""
+        label = LIST_LABELS[kind]
+        self.captured_users.pop(kind, None)
+        self.list_totals.pop(kind, None)
         try:
             username = self.config['INSTAGRAM_USERNAME'] if 'INSTAGRAM_USERNAME' in self.config else ''
             if not username:
                 self.logger.error("未設定 Instagram 帳號")
                 return []
                 
-            self.logger.info("開始獲取追蹤清單...")
-            self.driver.get(f"https://www.instagram.com/{username}/")
-            time.sleep(5)
+            self.logger.info(f"開始獲取{label}清單...")
+            self.navigate(self.profile_url(username))
 
-            self.logger.info("尋找追蹤中按鈕...")
-            following_link = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//a[contains(@href, '/following')]"))
+            self.logger.info(f"尋找{label}按鈕...")
+            list_link = self.waiter.until(
+                'profile',
+                EC.presence_of_element_located((By.XPATH, f"//a[contains(@href, '/{kind}')]"))
             )
-            self.logger.info(f"找到追蹤中連結: {following_link.text}")
-            following_count = int(''.join(filter(str.isdigit, following_link.text)))
-            self.logger.info(f"追蹤人數: {following_count}")
-            following_link.click()
-            time.sleep(3)
+            self.logger.info(f"找到{label}連結: {list_link.text}")
+            expected_count, exact = self.read_list_count(list_link)
+            if expected_count is None:
+                self.logger.error(f"無法解析{label}人數: {list_link.text}")
+                self.metrics.incr('failures')
+                return []
+            self.list_totals[kind] = expected_count if exact else None
+            self.logger.info(f"{label}人數: {expected_count}{'' if exact else '（縮寫的近似值）'}")
+            if expected_count == 0:
+                return []
+            self.capture.reset()
+            list_link.click()
 
-            dialog = WebDriverWait(self.driver, 10).until(
+            dialog = self.waiter.until(
+                'dialog',
                 EC.presence_of_element_located((By.XPATH, "//div[@role='dialog']"))
             )
             
             if dialog:
-                # 開始滾動並蒐集，最多嘗試3次
+                collected = []
+                usernames_found = set()
+
+                # 網路擷取模式：直接讀取分頁 API 的回應，不完整時再以 DOM 補齊
+                if self.capture.lists:
+                    captured = self.collect_from_network(kind, dialog, expected_count)
+                    self.captured_users[kind] = captured
+                    collected = list(captured)
+                    usernames_found = set(captured)
+                    collection_ratio = len(collected) / expected_count
+                    self.logger.info(f"網路擷取效率: {collection_ratio:.2%} ({len(collected)}/{expected_count})")
+                    if collection_ratio >= 0.9:
+                        return collected
+                    self.logger.warning("網路擷取不完整，改以 DOM 蒐集")
+
+                # 開始滾動並蒐集，最多嘗試3次；每次嘗試的結果會累積
                 for attempt in range(3):
-                    self.logger.info(f"開始第 {attempt + 1} 次嘗試蒐集追蹤名單...")
+                    self.logger.info(f"開始第 {attempt + 1} 次嘗試蒐集{label}名單...")
+                    if attempt:
+                        self.metrics.incr('retries')
                     
                     # 重置滾動位置
-                    self.driver.execute_script("""
-                        const dialog = document.querySelector('div[role="dialog"]');
-                        if (dialog) {
-                            const container = dialog.querySelector('div._aano > div');
-                            if (container) container.scrollTop = 0;
-                        }
-                    """)
-                    time.sleep(2)
-                    
-                    # 進行滾動載入
-                    if not self.scroll_dialog():  # 移除最大嘗試次數限制
-                        self.logger.warning("滾動過程出現問題，重試...")
-                        continue
-                    
-                    # 收集用戶名稱
-                    elements = dialog.find_elements(By.CSS_SELECTOR, "div[role='dialog'] a[role='link']")
-                    following_list = []
-                    usernames_found = set()
-                    
-                    for element in elements:
-                        href = element.get_attribute('href')
-                        if href and '/following' not in href:
-                            username = href.split('/')[-2]
+                    try:
+                        container = self.find_scroll_container(dialog)
+                        if container:
+                            self.driver.execute_script("arguments[0].scrollTop = 0;", container)
+                    except StaleElementReferenceException:
+                        self._scroll_container = None
+
+                    # 邊滾動邊收集用戶名稱
+                    try:
+                        for username in self.scroll_dialog():
                             if username and username not in usernames_found:
                                 usernames_found.add(username)
-                                following_list.append(username)
+                                collected.append(username)
+                    except Exception as e:
+                        self.logger.warning(f"滾動過程出現問題，重試... ({str(e)})")
+                        continue
                     
                     # 檢查蒐集品質
-                    collection_ratio = len(following_list) / following_count
-                    self.logger.info(f"蒐集效率: {collection_ratio:.2%} ({len(following_list)}/{following_count})")
+                    collection_ratio = len(collected) / expected_count
+                    self.logger.info(f"蒐集效率: {collection_ratio:.2%} ({len(collected)}/{expected_count})")
                     
                     if collection_ratio >= 0.9:  # 蒐集到90%以上就認為成功
-                        self.logger.info(f"已成功蒐集 {len(following_list)} 個追蹤帳號")
-                        return following_list
+                        self.logger.info(f"已成功蒐集 {len(collected)} 個{label}帳號")
+                        return collected
                     else:
-                        self.logger.warning(f"蒐集數量不足，已蒐集: {len(following_list)}，目標: {following_count}")
+                        self.logger.warning(f"蒐集數量不足，已蒐集: {len(collected)}，目標: {expected_count}")
                 
-                self.logger.error("多次嘗試後仍無法蒐集足夠的追蹤名單")
+                self.logger.error(f"多次嘗試後仍無法蒐集足夠的{label}名單")
+                self.metrics.incr('failures')
                 return []  # 返回空列表表示蒐集失敗
             else:
                 self.logger.error("找不到正確的對話框")
                 return []
 
         except Exception as e:
-            self.logger.error(f"獲取追蹤清單失敗: {str(e)}")
+            self.logger.error(f"獲取{label}清單失敗: {str(e)}")
+            self.metrics.incr('failures')
             return []
 
+    def collect_from_network(self, kind, dialog, expected_count):
+        """每次滾到對話框底部觸發下一頁請求，從 API 回應取得帳號與 id"""
+        label = LIST_LABELS[kind]
+        users = {}
+        idle = 0
+        while True:
+            self.metrics.incr('scroll_iterations')
+            try:
+                new_pages = self.waiter.until('scroll', lambda driver: self.capture.poll())
+            except TimeoutException:
+                new_pages = 0
+
+            finished = False
+            for page in self.capture.take(kind):
+                for user in page.users:
+                    users.setdefault(user['username'], user)
+                finished = finished or page.next_max_id is None
+            self.logger.info(f"已擷取{label}: {len(users)}")
+            if finished or len(users) >= expected_count:
+                break
+
+            # 連續沒有新的回應就停止，交給 DOM 蒐集
+            idle = 0 if new_pages else idle + 1
+            if idle >= 3:
+                break
+
+            container = self.find_scroll_container(dialog)
+            if not container:
+                break
+            try:
+                self.driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight;", container)
+            except StaleElementReferenceException:
+                self._scroll_container = None
+        return users
+
     def check_follows_me(self, username):
-        """檢查用戶是否追蹤我"""
+        """檢查用戶是否追蹤我；頁面載入失敗等無法判斷的情況回傳 None，留待下次重新檢查"""
         try:
             self.logger.info(f"檢查用戶 {username} 是否追蹤我...")
-            self.driver.get(f"https://www.instagram.com/{username}/")
-            time.sleep(3)
+            self.navigate(self.profile_url(username))
 
             # 檢查我的用戶名是否已設定
             my_username = self.config['INSTAGRAM_USERNAME'] if 'INSTAGRAM_USERNAME' in self.config else ''
             if not my_username:
                 self.logger.error("未設定 Instagram 帳號")
-                return False
+                return None
 
             # 先尋找追蹤數量的連結或按鈕
             try:
@@ -324,12 +661,14 @@ class InstagramCrawler:
                 ]
                 
                 following_element = None
-                following_count = 0
+                following_count = None
                 
                 for selector in selectors:
                     try:
-                        following_element = WebDriverWait(self.driver, 5).until(
-                            EC.presence_of_element_located((By.XPATH, selector))
+                        following_element = self.waiter.until(
+                            'profile',
+                            EC.presence_of_element_located((By.XPATH, selector)),
+                            timeout=5
                         )
                         # 找到元素後，獲取數字
                         text = following_element.text
@@ -342,6 +681,10 @@ class InstagramCrawler:
                     except (TimeoutException, ValueError, NoSuchElementException):
                         continue
                         
+                if following_count is None:
+                    self.logger.warning(f"無法取得用戶 {username} 的追蹤數量")
+                    self.metrics.incr('failures')
+                    return None
                 if following_count == 0:
                     self.logger.info(f"用戶 {username} 沒有追蹤任何人，因此確定沒有追蹤我")
                     return False
@@ -352,41 +695,53 @@ class InstagramCrawler:
                 if following_element:
                     self.logger.info(f"開始檢查 {username} 的追蹤列表...")
                     following_element.click()
-                    time.sleep(5)  # 增加等待時間確保對話框完全載入
-                    
+
                     # 檢查對話框是否出現
-                    dialog = WebDriverWait(self.driver, 10).until(
+                    dialog = self.waiter.until(
+                        'dialog',
                         EC.presence_of_element_located((By.XPATH, "//div[@role='dialog']"))
                     )
-                    
-                    # 增加短暫等待確保內容載入
-                    time.sleep(2)
+
+                    # 等待清單的 API 回應結束，前幾筆內容載入並穩定
+                    self.waiter.network_idle('idle', self.capture)
+                    self.waiter.count_stable('rows', DIALOG_LINKS, minimum=min(following_count, 5))
                     
                     # 檢查前5個用戶
                     first_users = dialog.find_elements(By.XPATH, ".//a[@role='link' and contains(@href, '/')]")[:5]
                     if not first_users:
                         self.logger.error("無法找到用戶列表")
-                        return False
+                        self.metrics.incr('failures')
+                        return None
                         
-                    my_profile = f"instagram.com/{my_username}/"
+                    my_profile = f"{self.site_host}/{my_username}/"
                     follows_me = any(my_profile in user.get_attribute('href').lower() for user in first_users)
                     
                     self.logger.info(f"用戶 {username} {'有' if follows_me else '沒有'}追蹤我")
                     return follows_me
                 else:
                     self.logger.error("無法點擊追蹤清單")
-                    return False
+                    self.metrics.incr('failures')
+                    return None
                     
             except (TimeoutException, NoSuchElementException) as e:
                 self.logger.error(f"檢查過程發生錯誤: {str(e)}")
-                return False
+                self.metrics.incr('failures')
+                return None
 
+        except (InvalidSessionIdException, NoSuchWindowException):
+            # 瀏覽器已經關閉，之後的檢查都會失敗，交由呼叫端中止並保留檢查點
+            self.metrics.incr('failures')
+            raise
         except Exception as e:
             self.logger.error(f"檢查用戶 {username} 是否追蹤我時失敗: {str(e)}")
-            return False
+            self.metrics.incr('failures')
+            return None
 
     def close(self):
         """關閉瀏覽器"""
+        if self.waiter and self.waiter.stats:
+            self.logger.info(f"等待時間統計: {self.waiter.summary()}")
         if self.driver:
+            self.finish_page()
             self.logger.info("關閉瀏覽器")
             self.driver.quit()
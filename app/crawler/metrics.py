@@ -0,0 +1,40 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RunMetrics:
+    """單次執行的各階段耗時與計數；平行檢查的工作執行緒共用同一個實例"""
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """累計區塊耗時，發生例外時也會記錄"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def time(self, name):
+        return self.timings.get(name, 0.0)
+
+    def count(self, name):
+        return self.counters.get(name, 0)
+
+    def summary(self):
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in sorted(self.timings.items())]
+        parts += [f"{name} {count}" for name, count in sorted(self.counters.items())]
+        return '，'.join(parts)
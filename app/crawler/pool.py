@@ -0,0 +1,92 @@
+import logging
+import queue
+import threading
+from app.crawler.instagram import InstagramCrawler
+from app.crawler.ratelimit import RateLimiter
+
+# 工作執行緒結束時放入結果佇列的標記
+_WORKER_DONE = object()
+
+
+class CrawlerPool:
+    """以多個瀏覽器工作階段平行檢查互相追蹤"""
+
+    def __init__(self, config, cookies, size=None, rate_limiter=None, metrics=None):
+        self.config = config
+        self.cookies = cookies
+        self.metrics = metrics
+        self.size = size or (config['CHECK_CONCURRENCY'] if 'CHECK_CONCURRENCY' in config else 1)
+        if rate_limiter is None:
+            rate_limit = config['CHECK_RATE_LIMIT'] if 'CHECK_RATE_LIMIT' in config else 0
+            rate_limiter = RateLimiter.per_minute(rate_limit)
+        self.rate_limiter = rate_limiter
+        self.logger = logging.getLogger(__name__)
+
+    def _worker(self, index, tasks, results):
+        """單一工作執行緒：建立自己的瀏覽器並從佇列取出帳號檢查"""
+        crawler = None
+        try:
+            # 瀏覽器資料目錄無法同時被多個瀏覽器使用，工作階段只靠 cookies 共用登入；
+            # 工作階段只檢查個人頁面，不需要網路擷取
+            crawler = InstagramCrawler(dict(self.config, CHROME_USER_DATA_DIR=None, CAPTURE_MODE='dom'))
+            if self.metrics:
+                crawler.metrics = self.metrics
+            crawler.init_driver()
+            crawler.import_cookies(self.cookies)
+            self.logger.info(f"工作階段 {index} 已就緒")
+
+            while True:
+                try:
+                    username = tasks.get_nowait()
+                except queue.Empty:
+                    break
+                self.rate_limiter.wait()
+                results.put((username, crawler.check_follows_me(username)))
+        except Exception as e:
+            self.logger.error(f"工作階段 {index} 發生錯誤: {str(e)}")
+            if self.metrics:
+                self.metrics.incr('failures')
+        finally:
+            if crawler:
+                crawler.close()
+            results.put(_WORKER_DONE)
+
+    def check_follows_me(self, usernames):
+        """平行檢查多個帳號，逐筆回傳 (username, follows_me) 供單一寫入者處理"""
+        tasks = queue.Queue()
+        for username in usernames:
+            tasks.put(username)
+        results = queue.Queue()
+
+        size = max(1, min(self.size, tasks.qsize()))
+        self.logger.info(f"使用 {size} 個工作階段檢查 {tasks.qsize()} 個帳號")
+        threads = [
+            threading.Thread(target=self._worker, args=(i + 1, tasks, results), daemon=True)
+            for i in range(size)
+        ]
+        for thread in threads:
+            thread.start()
+
+        running = len(threads)
+        while running:
+            item = results.get()
+            if item is _WORKER_DONE:
+                running -= 1
+                continue
+            yield item
+
+        if not tasks.empty():
+            self.logger.warning(f"所有工作階段已結束，仍有 {tasks.qsize()} 個帳號未檢查")
+
+
+def check_follows_me_all(crawler, config, usernames):
+    """依設定循序或平行檢查互相追蹤，逐筆回傳 (username, follows_me)"""
+    if config.get('CHECK_CONCURRENCY', 1) > 1:
+        pool = CrawlerPool(config, crawler.export_cookies(), metrics=crawler.metrics)
+        yield from pool.check_follows_me(usernames)
+        return
+
+    rate_limiter = RateLimiter.per_minute(config.get('CHECK_RATE_LIMIT', 0))
+    for username in usernames:
+        rate_limiter.wait()
+        yield username, crawler.check_follows_me(username)
@@ -0,0 +1,29 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """多個執行緒共用的速率限制，確保請求之間至少間隔 min_interval 秒"""
+
+    def __init__(self, min_interval):
+        self.min_interval = max(0.0, float(min_interval or 0))
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    @classmethod
+    def per_minute(cls, requests_per_minute):
+        """以每分鐘請求數建立速率限制，0 表示不限制"""
+        if not requests_per_minute:
+            return cls(0)
+        return cls(60.0 / requests_per_minute)
+
+    def wait(self):
+        """等待到下一個可用的時間點，回傳實際等待秒數"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
@@ -0,0 +1,135 @@
+import time
+from contextlib import contextmanager
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+# 各步驟預設的等待上限（秒）
+DEFAULT_BUDGETS = {
+    'navigate': 15,   # 頁面載入
+    'login': 15,      # 登入表單與登入完成
+    'popup': 5,       # 登入後的額外彈窗
+    'profile': 10,    # 個人頁面上的追蹤連結
+    'dialog': 10,     # 追蹤清單對話框
+    'rows': 8,        # 對話框內容穩定
+    'scroll': 5,      # 每次滾動後等待新項目
+    'idle': 3,        # 頁面載入後等待網路請求結束
+}
+
+
+class StepStats:
+    """單一步驟的等待統計"""
+
+    def __init__(self):
+        self.count = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, elapsed, timed_out=False):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        if timed_out:
+            self.timeouts += 1
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class AdaptiveWaiter:
+    """以 WebDriverWait 為基礎的等待層：條件成立就立即返回，並記錄每個步驟的耗時"""
+
+    def __init__(self, driver, budgets=None, poll_frequency=0.2):
+        self.driver = driver
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(budgets or {})
+        self.poll_frequency = poll_frequency
+        self.stats = {}
+
+    def budget(self, step):
+        return self.budgets.get(step, DEFAULT_BUDGETS['navigate'])
+
+    @contextmanager
+    def timed(self, step):
+        """記錄區塊耗時；逾時會被記錄後再拋出"""
+        stats = self.stats.setdefault(step, StepStats())
+        start = time.perf_counter()
+        try:
+            yield
+        except TimeoutException:
+            stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        stats.record(time.perf_counter() - start)
+
+    def until(self, step, condition, timeout=None):
+        """在步驟的時間預算內等待條件成立"""
+        with self.timed(step):
+            return WebDriverWait(
+                self.driver,
+                timeout if timeout is not None else self.budget(step),
+                poll_frequency=self.poll_frequency
+            ).until(condition)
+
+    def dom_ready(self, step='navigate'):
+        """等待 document.readyState 變成 complete"""
+        return self.until(
+            step,
+            lambda d: d.execute_script('return document.readyState') == 'complete'
+        )
+
+    def count(self, css_selector, root=None):
+        """以單次 JavaScript 呼叫計算符合選擇器的元素數量"""
+        return self.driver.execute_script(
+            'return (arguments[1] || document).querySelectorAll(arguments[0]).length;',
+            css_selector, root
+        )
+
+    def count_stable(self, step, css_selector, root=None, stable_for=0.6, minimum=1):
+        """等待元素數量至少為 minimum 且在 stable_for 秒內不再變化，回傳最後的數量"""
+        state = {'count': -1, 'since': time.monotonic()}
+
+        def stable(driver):
+            current = self.count(css_selector, root)
+            now = time.monotonic()
+            if current != state['count']:
+                state['count'] = current
+                state['since'] = now
+                return False
+            return current >= minimum and now - state['since'] >= stable_for
+
+        try:
+            self.until(step, stable)
+        except TimeoutException:
+            pass
+        return max(state['count'], 0)
+
+    def count_change(self, step, css_selector, previous, root=None, timeout=None):
+        """等待元素數量超過 previous，逾時則回傳目前數量"""
+        def grown(driver):
+            current = self.count(css_selector, root)
+            return current if current > previous else False
+
+        try:
+            return self.until(step, grown, timeout)
+        except TimeoutException:
+            return self.count(css_selector, root)
+
+    def network_idle(self, step, capture, idle_for=0.3):
+        """等待 CDP 回報的請求全部結束且 idle_for 秒內沒有新的請求，逾時回傳 False"""
+        def idle(driver):
+            capture.poll()
+            return capture.idle_for() >= idle_for
+
+        try:
+            self.until(step, idle)
+            return True
+        except TimeoutException:
+            return False
+
+    def summary(self):
+        """各步驟等待時間統計"""
+        return ', '.join(
+            f"{step}: {s.count} 次, 平均 {s.average:.2f}s, 最長 {s.max:.2f}s, 逾時 {s.timeouts} 次"
+            for step, s in sorted(self.stats.items())
+        )
@@ -0,0 +1,268 @@
+import json
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from app.crawler.instagram import InstagramCrawler
+from app.crawler.metrics import RunMetrics
+from app.crawler.pool import check_follows_me_all
+from app.database.generation import bump_generation
+from app.database.models import db
+from app.database.reconcile import reconcile_following, store_follows_me, update_instagram_ids
+from app.database.runs import recorded_run
+from app.followback import plan_followback_checks
+from app.database.snapshots import record_snapshot
+
+
+class ScheduledJob:
+    """固定間隔執行的工作，含隨機抖動與失敗退避"""
+
+    def __init__(self, name, func, interval, jitter=0.0, max_backoff=None):
+        self.name = name
+        self.func = func
+        self.interval = interval          # 秒
+        self.jitter = jitter              # 間隔的隨機浮動比例
+        # 退避上限不短於正常間隔，否則失敗後反而比成功時更早重試
+        self.max_backoff = max(interval, max_backoff) if max_backoff else interval * 8
+        self.next_run = time.time()
+        self.runs = 0
+        self.failures = 0                 # 連續失敗次數
+        self.last_started = None
+        self.last_duration = None
+        self.last_success = None
+        self.last_error = None
+
+    def due(self, now):
+        return now >= self.next_run
+
+    def run(self):
+        """執行工作並依結果排定下一次執行時間"""
+        self.last_started = time.time()
+        start = time.perf_counter()
+        try:
+            self.func()
+            self.failures = 0
+            self.last_success = True
+            self.last_error = None
+        except Exception as e:
+            self.failures += 1
+            self.last_success = False
+            self.last_error = str(e)
+            raise
+        finally:
+            self.runs += 1
+            self.last_duration = time.perf_counter() - start
+            self.next_run = time.time() + self.next_delay()
+
+    def next_delay(self):
+        """成功時依間隔加上抖動；連續失敗時以指數退避"""
+        if self.failures:
+            delay = min(self.interval * (2 ** (self.failures - 1)), self.max_backoff)
+        else:
+            delay = self.interval
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def status(self):
+        def fmt(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat(timespec='seconds') if timestamp else None
+
+        return {
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_started': fmt(self.last_started),
+            'last_duration': round(self.last_duration, 3) if self.last_duration is not None else None,
+            'last_success': self.last_success,
+            'last_error': self.last_error,
+            'next_run': fmt(self.next_run),
+        }
+
+
+class CrawlerDaemon:
+    """常駐爬蟲：保留同一個瀏覽器與資料庫連線，依排程分散執行清單蒐集與互相追蹤檢查"""
+
+    def __init__(self, app, logger):
+        self.app = app
+        self.logger = logger
+        self.config = app.config
+        self.crawler = None
+        self.metrics = RunMetrics()  # 目前工作的統計
+        self.queue = deque()      # 待檢查互相追蹤的帳號
+        self.queued = set()
+        self.snapshot_pending = False  # 本輪清單的互相追蹤檢查完成後保存快照
+        self.dirty = False  # 目前的工作已寫入資料，需要通知網頁端
+        self.started_at = time.time()
+
+        jitter = self.config.get('DAEMON_JITTER', 0.2)
+        max_backoff = self.config.get('DAEMON_MAX_BACKOFF', 120) * 60
+        self.jobs = [
+            ScheduledJob('scrape', self.scrape,
+                         self.config.get('DAEMON_SCRAPE_INTERVAL', 360) * 60, jitter, max_backoff),
+            ScheduledJob('followback', self.check_followbacks,
+                         self.config.get('DAEMON_CHECK_INTERVAL', 10) * 60, jitter, max_backoff),
+        ]
+
+    def ensure_crawler(self):
+        """需要時啟動瀏覽器並登入，之後重複使用"""
+        if self.crawler:
+            return self.crawler
+        crawler = InstagramCrawler(self.config)
+        crawler.metrics = self.metrics
+        try:
+            crawler.init_driver()
+            with self.metrics.phase('login'):
+                logged_in = crawler.login()
+            if not logged_in:
+                raise RuntimeError("登入失敗")
+        except Exception:
+            crawler.close()
+            raise
+        self.crawler = crawler
+        return crawler
+
+    def reset_crawler(self):
+        """關閉可能已經損壞的瀏覽器，下次工作時重新建立"""
+        if self.crawler:
+            try:
+                self.crawler.close()
+            except Exception as e:
+                self.logger.warning(f"關閉瀏覽器失敗: {str(e)}")
+        self.crawler = None
+
+    @contextmanager
+    def recorded(self, kind):
+        """以新的統計記錄一次工作，結果寫入 crawl_runs"""
+        self.metrics = RunMetrics()
+        if self.crawler:
+            self.crawler.metrics = self.metrics
+        with recorded_run(kind, self.metrics):
+            yield self.metrics
+            # 最後一個頁面的傳輸量算在本次工作
+            if self.crawler:
+                self.crawler.finish_page()
+        self.logger.info(f"{kind} 執行統計: {self.metrics.summary()}")
+
+    def scrape(self):
+        """蒐集完整追蹤清單並將需要檢查的帳號加入佇列"""
+        with self.recorded('scrape') as metrics:
+            crawler = self.ensure_crawler()
+            with metrics.phase('scrape'):
+                following_list = crawler.get_following_list()
+            if not following_list:
+                raise RuntimeError("獲取追蹤清單失敗")
+            metrics.incr('scraped', len(following_list))
+
+            result = reconcile_following(following_list)
+            self.dirty = True
+            metrics.add_time('write', result.write_seconds)
+            self.logger.info(f"追蹤清單比對完成: {result.summary()}")
+            if crawler.captured_users.get('following'):
+                with metrics.phase('write'):
+                    update_instagram_ids(crawler.captured_users['following'])
+
+            usernames = plan_followback_checks(
+                crawler, self.config, result.added + result.reactivated, self.logger
+            )
+
+        for username in usernames:
+            if username not in self.queued:
+                self.queued.add(username)
+                self.queue.append(username)
+        self.logger.info(f"待逐一檢查互相追蹤的帳號已加入佇列，佇列長度 {len(self.queue)}")
+        self.snapshot_pending = True
+        self.save_snapshot()
+
+    def check_followbacks(self):
+        """從佇列取出一批帳號檢查互相追蹤"""
+        if not self.queue:
+            return
+        batch_size = self.config.get('DAEMON_CHECK_BATCH', 50)
+        batch = [self.queue.popleft() for _ in range(min(batch_size, len(self.queue)))]
+        try:
+            with self.recorded('followback') as metrics:
+                crawler = self.ensure_crawler()
+                with metrics.phase('check'):
+                    stored = store_follows_me(
+                        check_follows_me_all(crawler, self.config, batch), metrics=metrics
+                    )
+        except Exception:
+            # 放回佇列前端，下次重試
+            self.queue.extendleft(reversed(batch))
+            raise
+        finally:
+            # 中途失敗前可能已分批寫入部分結果
+            if self.metrics.count('checked'):
+                self.dirty = True
+        self.queued.difference_update(batch)
+        self.logger.info(f"已檢查 {stored} 個帳號，佇列剩餘 {len(self.queue)}")
+        self.save_snapshot()
+
+    def save_snapshot(self):
+        """佇列清空後保存本輪的追蹤清單快照"""
+        if not self.snapshot_pending or self.queue:
+            return
+        entry = record_snapshot(self.config)
+        self.snapshot_pending = False
+        if entry:
+            self.logger.info(f"已保存追蹤快照 #{entry.number}: {entry.count} 個帳號，{entry.length} 位元組")
+
+    def status(self):
+        return {
+            'pid': os.getpid(),
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'browser_ready': self.crawler is not None,
+            'queue_depth': len(self.queue),
+            'jobs': {job.name: job.status() for job in self.jobs},
+        }
+
+    def write_status(self):
+        """將目前狀態寫入檔案，供外部監控讀取"""
+        status_file = self.config.get('DAEMON_STATUS_FILE')
+        if not status_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(status_file)), exist_ok=True)
+            tmp_path = status_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.status(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, status_file)
+        except OSError as e:
+            self.logger.warning(f"寫入常駐狀態失敗: {str(e)}")
+
+    def run_forever(self):
+        """主迴圈：依排程執行到期的工作"""
+        self.logger.info("常駐爬蟲已啟動")
+        with self.app.app_context():
+            try:
+                while True:
+                    now = time.time()
+                    for job in self.jobs:
+                        if not job.due(now):
+                            continue
+                        self.logger.info(f"執行排程工作: {job.name}")
+                        self.dirty = False
+                        try:
+                            job.run()
+                        except Exception as e:
+                            self.logger.error(
+                                f"排程工作 {job.name} 失敗 (連續 {job.failures} 次): {str(e)}"
+                            )
+                            # 常駐期間共用同一個應用程式環境，避免失敗的交易影響之後的工作
+                            db.session.rollback()
+                            self.reset_crawler()
+                        # 工作有寫入資料（包含失敗前寫入的部分結果）才通知網頁端重新讀取
+                        if self.dirty:
+                            bump_generation(self.config)
+                        # 每個工作結束後釋放工作階段，下一個工作重新開始
+                        db.session.remove()
+
+                    self.write_status()
+                    next_run = min(job.next_run for job in self.jobs)
+                    time.sleep(max(1.0, min(next_run - time.time(), 60.0)))
+            except KeyboardInterrupt:
+                self.logger.info("收到中斷訊號，停止常駐爬蟲")
+            finally:
+                self.reset_crawler()
+                self.write_status()
@@ -0,0 +1,175 @@
+from datetime import datetime
+from sqlalchemy import select, insert, update, delete, func
+from app.database.models import db, User, CrawlCheckpoint, CheckpointEntry
+from app.database.reconcile import LOOKUP_CHUNK_SIZE, lookup_user_ids
+
+# 尚未完成、可以用 --resume 繼續的階段
+UNFINISHED_STAGES = ('scraped', 'checking')
+
+
+class CrawlProgress:
+    """一次爬蟲執行的進度：蒐集到的追蹤清單、互相追蹤檢查佇列與已寫入結果的帳號
+
+    scraped 階段只保存了追蹤清單，繼續時重新決定檢查佇列；
+    checking 階段繼續時只檢查佇列中尚未檢查的帳號。檢查後無法判斷的帳號（已刪除、
+    不公開或暫時被限制）也算檢查完畢，不會讓檢查點一直無法完成；
+    這些帳號的檢查時間沒有更新，之後的檢查計畫會再挑到它們。
+    """
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+
+    @property
+    def stage(self):
+        return self.checkpoint.stage
+
+    def _entries(self):
+        return CheckpointEntry.checkpoint_id == self.checkpoint.id
+
+    def _usernames(self, *conditions):
+        return db.session.execute(
+            select(User.username)
+            .join(CheckpointEntry, CheckpointEntry.user_id == User.id)
+            .where(self._entries(), *conditions)
+            .order_by(CheckpointEntry.user_id)
+        ).scalars().all()
+
+    def _count(self, *conditions):
+        return db.session.execute(
+            select(func.count()).select_from(CheckpointEntry).where(self._entries(), *conditions)
+        ).scalar()
+
+    def _set_stage(self, stage):
+        self.checkpoint.stage = stage
+        self.checkpoint.updated_at = datetime.utcnow()
+
+    def forced_usernames(self):
+        return self._usernames(CheckpointEntry.forced == True)
+
+    def pending_usernames(self):
+        """佇列中尚未檢查的帳號"""
+        return self._usernames(CheckpointEntry.queued == True, CheckpointEntry.checked == False)
+
+    def pending_count(self):
+        return self._count(CheckpointEntry.queued == True, CheckpointEntry.checked == False)
+
+    def undetermined_count(self):
+        return self._count(CheckpointEntry.undetermined == True)
+
+    def save_queue(self, usernames):
+        """保存互相追蹤檢查佇列，進入 checking 階段"""
+        ids = lookup_user_ids(usernames)
+        try:
+            db.session.execute(
+                update(CheckpointEntry).where(self._entries())
+                .values(queued=False, checked=False, undetermined=False)
+            )
+            existing = set(db.session.execute(
+                select(CheckpointEntry.user_id).where(self._entries())
+            ).scalars())
+            queued = [user_id for user_id in ids.values() if user_id in existing]
+            for start in range(0, len(queued), LOOKUP_CHUNK_SIZE):
+                db.session.execute(
+                    update(CheckpointEntry)
+                    .where(self._entries(), CheckpointEntry.user_id.in_(queued[start:start + LOOKUP_CHUNK_SIZE]))
+                    .values(queued=True)
+                )
+            # 檢查計畫可能包含不在這次清單中的帳號
+            missing = [user_id for user_id in ids.values() if user_id not in existing]
+            if missing:
+                db.session.execute(insert(CheckpointEntry), [
+                    {'checkpoint_id': self.checkpoint.id, 'user_id': user_id, 'queued': True}
+                    for user_id in missing
+                ])
+            self._set_stage('checking')
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def mark_checked(self, results):
+        """標記已檢查的帳號 {username: follows_me}，None 表示無法判斷；
+        不提交，與檢查結果在同一個交易中寫入"""
+        for undetermined in (False, True):
+            usernames = [username for username, follows_me in results.items()
+                         if (follows_me is None) == undetermined]
+            for start in range(0, len(usernames), LOOKUP_CHUNK_SIZE):
+                chunk = usernames[start:start + LOOKUP_CHUNK_SIZE]
+                db.session.execute(
+                    update(CheckpointEntry)
+                    .where(self._entries(),
+                           CheckpointEntry.user_id.in_(select(User.id).where(User.username.in_(chunk))))
+                    .values(checked=True, undetermined=undetermined)
+                )
+        self.checkpoint.updated_at = datetime.utcnow()
+
+    def complete(self):
+        """全部檢查完成後清除進度明細"""
+        try:
+            db.session.execute(delete(CheckpointEntry).where(self._entries()))
+            self._set_stage('complete')
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def summary(self):
+        checkpoint = self.checkpoint
+        text = f"檢查點 #{checkpoint.id}（{checkpoint.created_at:%Y-%m-%d %H:%M}）：追蹤清單 {checkpoint.scraped_count} 個帳號"
+        if checkpoint.stage == 'checking':
+            queued = self._count(CheckpointEntry.queued == True)
+            text += f"，已檢查 {queued - self.pending_count()}/{queued}"
+        return text
+
+
+def abandon_unfinished():
+    """放棄尚未完成的檢查點並清除明細"""
+    ids = db.session.execute(
+        select(CrawlCheckpoint.id).where(CrawlCheckpoint.stage.in_(UNFINISHED_STAGES))
+    ).scalars().all()
+    if ids:
+        db.session.execute(delete(CheckpointEntry).where(CheckpointEntry.checkpoint_id.in_(ids)))
+        db.session.execute(
+            update(CrawlCheckpoint).where(CrawlCheckpoint.id.in_(ids)).values(stage='abandoned')
+        )
+    return len(ids)
+
+
+def start_progress(following_list, forced=(), run=None, now=None):
+    """蒐集完追蹤清單後建立新的檢查點；之前未完成的檢查點一併放棄"""
+    now = now or datetime.utcnow()
+    ids = lookup_user_ids(following_list)
+    forced = set(forced)
+    try:
+        abandon_unfinished()
+        checkpoint = CrawlCheckpoint(
+            run_id=run.id if run else None, stage='scraped',
+            created_at=now, updated_at=now, scraped_count=len(ids),
+        )
+        db.session.add(checkpoint)
+        db.session.flush()
+        if ids:
+            db.session.execute(insert(CheckpointEntry), [
+                {'checkpoint_id': checkpoint.id, 'user_id': user_id, 'forced': username in forced}
+                for username, user_id in ids.items()
+            ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return CrawlProgress(checkpoint)
+
+
+def resume_progress():
+    """取得最近一次未完成的檢查點，沒有時回傳 None"""
+    checkpoint = db.session.execute(
+        select(CrawlCheckpoint)
+        .where(CrawlCheckpoint.stage.in_(UNFINISHED_STAGES))
+        .order_by(CrawlCheckpoint.id.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+    if checkpoint is None:
+        return None
+    checkpoint.resumes = (checkpoint.resumes or 0) + 1
+    db.session.commit()
+    return CrawlProgress(checkpoint)
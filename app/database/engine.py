@@ -0,0 +1,52 @@
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+
+# 可接受的 PRAGMA 值，避免設定值被直接拼進 SQL
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_LEVELS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+def _get(config, key, default):
+    return config[key] if key in config and config[key] is not None else default
+
+
+def engine_options(config, single_writer=False):
+    """依設定產生 SQLALCHEMY_ENGINE_OPTIONS"""
+    options = {
+        'connect_args': {
+            # sqlite3 的 timeout 即為 busy timeout（秒）
+            'timeout': _get(config, 'SQLITE_BUSY_TIMEOUT', 5000) / 1000,
+        },
+    }
+    if single_writer:
+        # 爬蟲只有一個寫入者：整個行程共用一個長期存在的連線
+        options['poolclass'] = StaticPool
+        options['connect_args']['check_same_thread'] = False
+    return options
+
+
+def configure_sqlite(engine, config):
+    """在每個新連線上套用 WAL、同步等級、快取與 mmap 設定"""
+    journal_mode = str(_get(config, 'SQLITE_JOURNAL_MODE', 'WAL')).upper()
+    synchronous = str(_get(config, 'SQLITE_SYNCHRONOUS', 'NORMAL')).upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"不支援的 SQLITE_JOURNAL_MODE: {journal_mode}")
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"不支援的 SQLITE_SYNCHRONOUS: {synchronous}")
+
+    pragmas = [
+        f'PRAGMA journal_mode={journal_mode}',
+        f'PRAGMA synchronous={synchronous}',
+        f'PRAGMA cache_size={int(_get(config, "SQLITE_CACHE_SIZE", -20000))}',
+        f'PRAGMA mmap_size={int(_get(config, "SQLITE_MMAP_SIZE", 0))}',
+        f'PRAGMA busy_timeout={int(_get(config, "SQLITE_BUSY_TIMEOUT", 5000))}',
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.database.models import db, User, Following
+
+
+class RecheckPlan:
+    """本次需要重新檢查互相追蹤的帳號"""
+
+    def __init__(self):
+        self.new = []       # 新追蹤、重新追蹤或從未檢查過
+        self.stale = []     # 超過有效期限
+        self.sample = []    # 輪替抽樣的其餘帳號
+        self.skipped = 0    # 快取仍有效而略過
+
+    @property
+    def usernames(self):
+        return self.new + self.stale + self.sample
+
+    def summary(self):
+        return (
+            f"新帳號 {len(self.new)}，過期 {len(self.stale)}，"
+            f"輪替抽樣 {len(self.sample)}，略過 {self.skipped}"
+        )
+
+
+def plan_rechecks(forced, ttl_hours, sample_size, now=None):
+    """依檢查時間決定哪些追蹤中的帳號需要重新檢查"""
+    now = now or datetime.utcnow()
+    expires = now - timedelta(hours=ttl_hours)
+    forced = set(forced)
+    plan = RecheckPlan()
+
+    # 依上次檢查時間由舊到新排序，抽樣時優先取最久沒檢查的帳號
+    rows = db.session.execute(
+        select(User.username, Following.follows_me_checked_at)
+        .join(Following.user)
+        .where(Following.current_status == True)
+        .order_by(Following.follows_me_checked_at.asc(), Following.id.asc())
+    )
+    fresh = []
+    for username, checked_at in rows:
+        if username in forced or checked_at is None:
+            plan.new.append(username)
+        elif checked_at < expires:
+            plan.stale.append(username)
+        else:
+            fresh.append(username)
+
+    plan.sample = fresh[:max(sample_size, 0)]
+    plan.skipped = len(fresh) - len(plan.sample)
+    return plan
@@ -0,0 +1,31 @@
+import os
+
+
+def generation_path(config):
+    return config['CRAWL_GENERATION_FILE'] if 'CRAWL_GENERATION_FILE' in config else None
+
+
+def read_generation(config):
+    """讀取目前的資料世代編號；每次爬蟲完成寫入後遞增，檔案不存在時為 0"""
+    path = generation_path(config)
+    if not path:
+        return 0
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_generation(config):
+    """遞增資料世代編號，讓網頁端的快取失效"""
+    path = generation_path(config)
+    if not path:
+        return 0
+    generation = read_generation(config) + 1
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(str(generation))
+    os.replace(tmp_path, path)
+    return generation
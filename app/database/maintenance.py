@@ -0,0 +1,30 @@
+from sqlalchemy import text
+from app.database.models import db
+from app.database.migrations import backfill_last_event
+
+
+def compact_history():
+    """移除重複記錄的追蹤事件，只保留每個帳號的狀態轉換"""
+    with db.engine.begin() as conn:
+        before = conn.execute(text('SELECT COUNT(*) FROM follow_history')).scalar()
+
+        # 同一帳號連續出現相同類型的事件時，只保留最早的一筆
+        conn.execute(text("""
+            DELETE FROM follow_history WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, event_type, LAG(event_type) OVER (
+                        PARTITION BY user_id ORDER BY event_date, id
+                    ) AS prev_type
+                    FROM follow_history
+                ) WHERE prev_type = event_type
+            )
+        """))
+        backfill_last_event(conn)
+
+        after = conn.execute(text('SELECT COUNT(*) FROM follow_history')).scalar()
+
+    # 釋放刪除後的空間
+    with db.engine.connect() as conn:
+        conn.execution_options(isolation_level='AUTOCOMMIT').execute(text('VACUUM'))
+
+    return before - after
@@ -0,0 +1,142 @@
+from sqlalchemy import inspect, text
+from app.database.models import User, Following, FollowHistory
+
+# 既有資料庫需要補上的欄位 (資料表, 欄位, 欄位定義)
+COLUMNS = [
+    ('following', 'last_event', 'VARCHAR(20)'),
+    ('following', 'follows_me_checked_at', 'DATETIME'),
+    ('users', 'instagram_id', 'VARCHAR(32)'),
+    ('crawl_runs', 'navigations', 'INTEGER DEFAULT 0'),
+    ('crawl_runs', 'bytes_transferred', 'INTEGER DEFAULT 0'),
+    ('crawl_runs', 'page_load_seconds', 'FLOAT'),
+    ('crawl_checkpoint_entries', 'undetermined', 'BOOLEAN DEFAULT 0'),
+]
+
+
+def backfill_last_event(conn):
+    """依歷史記錄回填每個帳號最後一次記錄的事件"""
+    conn.execute(text("""
+        UPDATE following SET last_event = (
+            SELECT h.event_type FROM follow_history h
+            WHERE h.user_id = following.user_id
+            ORDER BY h.event_date DESC, h.id DESC
+            LIMIT 1
+        )
+    """))
+
+
+# 新增欄位後需要執行的資料回填
+BACKFILLS = {
+    ('following', 'last_event'): backfill_last_event,
+}
+
+
+def dedupe_following(conn, key='user_id'):
+    """建立唯一索引前移除重複的帳號，保留追蹤中且最近出現的一筆"""
+    conn.execute(text(f"""
+        DELETE FROM following WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY {key}
+                    ORDER BY current_status DESC, last_seen DESC, id DESC
+                ) AS rank
+                FROM following
+            ) WHERE rank > 1
+        )
+    """))
+
+
+# 既有資料庫需要補上的索引 (索引名稱, 資料表, 欄位, 是否唯一, 建立前的資料整理)
+INDEXES = [
+    ('ix_following_user_id', 'following', ('user_id',), True, dedupe_following),
+    ('ix_following_status_follows_first_seen', 'following',
+     ('current_status', 'follows_me', 'first_seen'), False, None),
+    ('ix_follow_history_event_date', 'follow_history', ('event_date',), False, None),
+    ('ix_follow_history_user_event_date', 'follow_history', ('user_id', 'event_date'), False, None),
+    ('ix_users_instagram_id', 'users', ('instagram_id',), False, None),
+]
+
+# 舊版以帳號字串為鍵、需要改為參照 users 的資料表
+LEGACY_TABLES = ('following', 'follow_history')
+
+
+def intern_usernames(conn, logger=None):
+    """將舊版 following 與 follow_history 的帳號字串改存 users 的整數 id
+
+    users.id 沿用原本的 following.id，既有的追蹤快照仍然有效；
+    只出現在歷史記錄中的帳號另外配發新的 id。
+    """
+    inspector = inspect(conn)
+    legacy_columns = {c['name'] for c in inspector.get_columns('following')}
+    User.__table__.create(conn, checkfirst=True)
+
+    dedupe_following(conn, 'username')
+    conn.execute(text('INSERT INTO users (id, username) SELECT id, username FROM following'))
+    conn.execute(text("""
+        INSERT INTO users (username)
+        SELECT DISTINCT username FROM follow_history
+        WHERE username NOT IN (SELECT username FROM users)
+    """))
+
+    # 舊資料表的索引名稱與新資料表相同，改名前先移除
+    for table in LEGACY_TABLES:
+        for index in inspector.get_indexes(table):
+            conn.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+        conn.execute(text(f'ALTER TABLE {table} RENAME TO {table}_legacy'))
+    Following.__table__.create(conn)
+    FollowHistory.__table__.create(conn)
+
+    optional = ', '.join(
+        column if column in legacy_columns else 'NULL'
+        for column in ('last_event', 'follows_me_checked_at')
+    )
+    conn.execute(text(f"""
+        INSERT INTO following (id, user_id, follows_me, first_seen, last_seen, current_status,
+                               last_event, follows_me_checked_at)
+        SELECT id, id, follows_me, first_seen, last_seen, current_status, {optional}
+        FROM following_legacy
+    """))
+    conn.execute(text("""
+        INSERT INTO follow_history (id, user_id, event_type, event_date)
+        SELECT h.id, u.id, h.event_type, h.event_date
+        FROM follow_history_legacy h JOIN users u ON u.username = h.username
+    """))
+    for table in LEGACY_TABLES:
+        conn.execute(text(f'DROP TABLE {table}_legacy'))
+
+    if 'last_event' not in legacy_columns:
+        backfill_last_event(conn)
+    if logger:
+        logger.info("已將帳號改存於 users 資料表；執行 compact-history 可釋放舊資料佔用的空間")
+
+
+def upgrade_schema(engine, logger=None):
+    """為既有資料庫補上新版本需要的欄位與索引"""
+    with engine.begin() as conn:
+        if 'username' in {c['name'] for c in inspect(conn).get_columns('following')}:
+            intern_usernames(conn, logger)
+
+        inspector = inspect(conn)
+        for table, column, ddl in COLUMNS:
+            existing = {c['name'] for c in inspector.get_columns(table)}
+            if column in existing:
+                continue
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            backfill = BACKFILLS.get((table, column))
+            if backfill:
+                backfill(conn)
+            if logger:
+                logger.info(f"已新增欄位 {table}.{column}")
+
+        for name, table, columns, unique, prepare in INDEXES:
+            existing = {index['name'] for index in inspector.get_indexes(table)}
+            if name in existing:
+                continue
+            if prepare:
+                prepare(conn)
+            conn.execute(text(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+                f"ON {table} ({', '.join(columns)})"
+            ))
+            if logger:
+                logger.info(f"已建立索引 {name}")
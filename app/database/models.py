@@ -3,26 +3,129 @@ from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+class User(db.Model):
+    __tablename__ = 'users'
+
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(100), nullable=False, unique=True, index=True)
+    instagram_id = db.Column(db.String(32), index=True)  # 網路擷取模式取得的 Instagram 帳號 id
+
+    def __repr__(self):
+        return f'<User {self.username}>'
+
 class Following(db.Model):
     __tablename__ = 'following'
+    __table_args__ = (
+        # 首頁依狀態篩選並依初次追蹤時間排序
+        db.Index('ix_following_status_follows_first_seen', 'current_status', 'follows_me', 'first_seen'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True, index=True)
     follows_me = db.Column(db.Boolean, default=False)
     first_seen = db.Column(db.DateTime, default=datetime.utcnow)
     last_seen = db.Column(db.DateTime, default=datetime.utcnow)
     current_status = db.Column(db.Boolean, default=True)
+    last_event = db.Column(db.String(20))  # 最後一次記錄的事件，避免重複記錄
+    follows_me_checked_at = db.Column(db.DateTime)  # 最後一次檢查是否互相追蹤的時間
+
+    user = db.relationship('User', lazy='joined')
+
+    @property
+    def username(self):
+        return self.user.username
 
     def __repr__(self):
         return f'<Following {self.username}>'
 
 class FollowHistory(db.Model):
     __tablename__ = 'follow_history'
+    __table_args__ = (
+        # 依帳號查詢事件順序（回填最後事件、清理重複事件）
+        db.Index('ix_follow_history_user_event_date', 'user_id', 'event_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     event_type = db.Column(db.String(20), nullable=False)  # 'new_follow' 或 'unfollow'
-    event_date = db.Column(db.DateTime, default=datetime.utcnow)
+    event_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    user = db.relationship('User', lazy='joined')
+
+    @property
+    def username(self):
+        return self.user.username
 
     def __repr__(self):
         return f'<FollowHistory {self.username} {self.event_type}>'
+
+class CrawlRun(db.Model):
+    __tablename__ = 'crawl_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'crawl'、'scrape' 或 'followback'
+    status = db.Column(db.String(20), nullable=False, default='running')  # 'running'、'success' 或 'failed'
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime)
+    login_seconds = db.Column(db.Float)
+    scrape_seconds = db.Column(db.Float)
+    scroll_iterations = db.Column(db.Integer, default=0)
+    scraped_count = db.Column(db.Integer, default=0)
+    check_seconds = db.Column(db.Float)
+    checked_count = db.Column(db.Integer, default=0)
+    write_seconds = db.Column(db.Float)
+    navigations = db.Column(db.Integer, default=0)
+    bytes_transferred = db.Column(db.Integer, default=0)  # 頁面載入時傳輸的位元組數
+    page_load_seconds = db.Column(db.Float)
+    retries = db.Column(db.Integer, default=0)
+    failures = db.Column(db.Integer, default=0)
+    error = db.Column(db.String(500))
+
+    @property
+    def users_per_second(self):
+        """互相追蹤檢查的速度"""
+        if not self.checked_count or not self.check_seconds:
+            return None
+        return self.checked_count / self.check_seconds
+
+    @property
+    def kb_per_navigation(self):
+        if not self.navigations:
+            return None
+        return (self.bytes_transferred or 0) / 1024 / self.navigations
+
+    @property
+    def load_seconds_per_navigation(self):
+        if not self.navigations or self.page_load_seconds is None:
+            return None
+        return self.page_load_seconds / self.navigations
+
+    def __repr__(self):
+        return f'<CrawlRun {self.id} {self.kind} {self.status}>'
+
+class CrawlCheckpoint(db.Model):
+    __tablename__ = 'crawl_checkpoints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('crawl_runs.id'))  # 建立檢查點的執行
+    stage = db.Column(db.String(20), nullable=False, default='scraped')  # 'scraped'、'checking'、'complete' 或 'abandoned'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    scraped_count = db.Column(db.Integer, default=0)
+    resumes = db.Column(db.Integer, default=0)  # 以 --resume 繼續的次數
+
+    def __repr__(self):
+        return f'<CrawlCheckpoint {self.id} {self.stage}>'
+
+class CheckpointEntry(db.Model):
+    __tablename__ = 'crawl_checkpoint_entries'
+
+    checkpoint_id = db.Column(db.Integer, db.ForeignKey('crawl_checkpoints.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    forced = db.Column(db.Boolean, default=False)   # 本次新追蹤或重新追蹤，必須檢查
+    queued = db.Column(db.Boolean, default=False)   # 在互相追蹤檢查佇列中
+    checked = db.Column(db.Boolean, default=False)  # 已檢查完畢（包含無法判斷）
+    undetermined = db.Column(db.Boolean, default=False)  # 檢查失敗無法判斷，沒有寫入結果
+
+    def __repr__(self):
+        return f'<CheckpointEntry {self.checkpoint_id} {self.user_id}>'
@@ -0,0 +1,300 @@
+import logging
+import time
+from datetime import datetime
+from sqlalchemy import select, insert, update
+from app.database.models import db, User, Following, FollowHistory
+
+# 互相追蹤檢查結果每累積多少筆寫入一次
+FOLLOWS_ME_BATCH_SIZE = 50
+# 以 IN 查詢帳號 id 時每次帶入的數量
+LOOKUP_CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+class ReconcileResult:
+    """追蹤清單比對結果"""
+
+    def __init__(self):
+        self.added = []          # 新出現的帳號
+        self.reactivated = []    # 重新追蹤的帳號
+        self.removed = []        # 本次取消追蹤的帳號
+        self.unchanged = []      # 持續追蹤中的帳號
+        self.unrecorded = []     # 已取消追蹤但尚未記錄事件的帳號
+        self.diff_seconds = 0.0
+        self.write_seconds = 0.0
+
+    def summary(self):
+        return (
+            f"新增 {len(self.added)}，重新追蹤 {len(self.reactivated)}，"
+            f"取消追蹤 {len(self.removed)}，未變動 {len(self.unchanged)}；"
+            f"比對耗時 {self.diff_seconds:.3f}s，寫入耗時 {self.write_seconds:.3f}s"
+        )
+
+
+def lookup_user_ids(usernames):
+    """查詢帳號對應的 users.id {username: id}，不存在的帳號不會出現在結果中"""
+    usernames = list(usernames)
+    ids = {}
+    for start in range(0, len(usernames), LOOKUP_CHUNK_SIZE):
+        chunk = usernames[start:start + LOOKUP_CHUNK_SIZE]
+        ids.update(db.session.execute(
+            select(User.username, User.id).where(User.username.in_(chunk))
+        ).all())
+    return ids
+
+
+def intern_users(usernames):
+    """取得帳號的 users.id，尚未出現過的帳號批次新增"""
+    ids = lookup_user_ids(usernames)
+    missing = [username for username in usernames if username not in ids]
+    if missing:
+        db.session.execute(insert(User), [{'username': username} for username in missing])
+        ids.update(lookup_user_ids(missing))
+    return ids
+
+
+def load_snapshot():
+    """一次載入目前的追蹤快照 {username: (id, current_status, last_event, user_id)}"""
+    rows = db.session.execute(
+        select(Following.id, User.username, Following.current_status, Following.last_event, User.id)
+        .join(Following.user)
+    )
+    return {
+        username: (following_id, bool(status), last_event, user_id)
+        for following_id, username, status, last_event, user_id in rows
+    }
+
+
+def diff_following(snapshot, following_list):
+    """以集合運算比對快照與爬取到的清單"""
+    result = ReconcileResult()
+    scraped = set(following_list)
+    known = set(snapshot)
+    active = {username for username, row in snapshot.items() if row[1]}
+
+    result.added = sorted(scraped - known)
+    result.reactivated = sorted((scraped & known) - active)
+    result.unchanged = sorted(scraped & active)
+    result.removed = sorted(active - scraped)
+    # 只有狀態轉換才產生事件；舊資料中未記錄過取消追蹤的帳號補記一次
+    result.unrecorded = sorted(
+        username for username in known - active - scraped
+        if snapshot[username][2] != 'unfollow'
+    )
+    return result
+
+
+def apply_diff(snapshot, result, now=None):
+    """將比對結果以批次 INSERT/UPDATE 寫入（單一交易）"""
+    now = now or datetime.utcnow()
+
+    try:
+        user_ids = {username: row[3] for username, row in snapshot.items()}
+        if result.added:
+            user_ids.update(intern_users(result.added))
+            db.session.execute(insert(Following), [
+                {
+                    'user_id': user_ids[username],
+                    'current_status': True,
+                    'follows_me': False,
+                    'first_seen': now,
+                    'last_seen': now,
+                    'last_event': 'new_follow',
+                } for username in result.added
+            ])
+
+        if result.reactivated:
+            db.session.execute(update(Following), [
+                {
+                    'id': snapshot[username][0],
+                    'current_status': True,
+                    'last_seen': now,
+                    'last_event': 'new_follow',
+                } for username in result.reactivated
+            ])
+
+        if result.unchanged:
+            db.session.execute(update(Following), [
+                {'id': snapshot[username][0], 'last_seen': now}
+                for username in result.unchanged
+            ])
+
+        unfollowed = result.removed + result.unrecorded
+        if unfollowed:
+            db.session.execute(update(Following), [
+                {'id': snapshot[username][0], 'current_status': False, 'last_event': 'unfollow'}
+                for username in unfollowed
+            ])
+
+        events = [
+            {'user_id': user_ids[username], 'event_type': 'new_follow', 'event_date': now}
+            for username in result.added + result.reactivated
+        ]
+        events += [
+            {'user_id': user_ids[username], 'event_type': 'unfollow', 'event_date': now}
+            for username in unfollowed
+        ]
+        if events:
+            db.session.execute(insert(FollowHistory), events)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def reconcile_following(following_list, now=None):
+    """比對爬取到的追蹤清單並批次更新資料庫"""
+    start = time.perf_counter()
+    snapshot = load_snapshot()
+    result = diff_following(snapshot, following_list)
+    result.diff_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    apply_diff(snapshot, result, now)
+    result.write_seconds = time.perf_counter() - start
+    return result
+
+
+def update_follows_me(results, now=None, progress=None):
+    """批次寫入互相追蹤檢查結果 {username: follows_me}，並記錄檢查時間；
+    有 progress 時在同一個交易中標記檢查點進度。結果為 None（無法判斷）的帳號不寫入，
+    檢查時間維持不變，之後的檢查計畫會再挑到它"""
+    if not results:
+        return
+    determined = {username: follows_me for username, follows_me in results.items() if follows_me is not None}
+    now = now or datetime.utcnow()
+    try:
+        if determined:
+            ids = dict(db.session.execute(
+                select(User.username, Following.id).join(Following.user)
+                .where(User.username.in_(list(determined)))
+            ).all())
+            db.session.execute(update(Following), [
+                {'id': ids[username], 'follows_me': follows_me, 'follows_me_checked_at': now}
+                for username, follows_me in determined.items() if username in ids
+            ])
+        if progress is not None:
+            progress.mark_checked(results)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def update_instagram_ids(captured):
+    """保存網路擷取取得的 Instagram 帳號 id {username: {'id': ...}}，只更新有變動的帳號"""
+    wanted = {username: user['id'] for username, user in captured.items() if user.get('id')}
+    if not wanted:
+        return 0
+    rows = []
+    usernames = list(wanted)
+    for start in range(0, len(usernames), LOOKUP_CHUNK_SIZE):
+        chunk = usernames[start:start + LOOKUP_CHUNK_SIZE]
+        rows += db.session.execute(
+            select(User.id, User.username, User.instagram_id).where(User.username.in_(chunk))
+        ).all()
+    updates = [
+        {'id': user_id, 'instagram_id': wanted[username]}
+        for user_id, username, instagram_id in rows if instagram_id != wanted[username]
+    ]
+    try:
+        if updates:
+            db.session.execute(update(User), updates)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(updates)
+
+
+class FollowbackResult:
+    """以粉絲清單判斷互相追蹤的結果"""
+
+    def __init__(self, followers, complete):
+        self.followers = followers   # 蒐集到的粉絲數
+        self.complete = complete     # 粉絲清單是否完整
+        self.mutual = 0              # 追蹤中且在粉絲清單中的帳號
+        self.changed = 0             # 互相追蹤狀態有變動的帳號
+        self.ambiguous = []          # 清單不完整時無法判斷、需逐一檢查的帳號
+        self.write_seconds = 0.0
+
+    def summary(self):
+        return (
+            f"粉絲 {self.followers}{'' if self.complete else '（不完整）'}，互相追蹤 {self.mutual}，"
+            f"狀態變動 {self.changed}，待逐一檢查 {len(self.ambiguous)}；寫入耗時 {self.write_seconds:.3f}s"
+        )
+
+
+def apply_followers(followers, complete, now=None):
+    """以粉絲清單與追蹤中帳號的交集更新互相追蹤狀態
+
+    清單完整時不在清單中的帳號即為沒有追蹤我；不完整時只確認找到的帳號，
+    其餘帳號維持原狀並列為待逐一檢查。
+    """
+    now = now or datetime.utcnow()
+    followers = set(followers)
+    result = FollowbackResult(len(followers), complete)
+    rows = db.session.execute(
+        select(Following.id, User.username, Following.follows_me)
+        .join(Following.user)
+        .where(Following.current_status == True)
+    )
+
+    updates = []
+    for following_id, username, follows_me in rows:
+        if username in followers:
+            result.mutual += 1
+            found = True
+        elif complete:
+            found = False
+        else:
+            result.ambiguous.append(username)
+            continue
+        if bool(follows_me) != found:
+            result.changed += 1
+        updates.append({'id': following_id, 'follows_me': found, 'follows_me_checked_at': now})
+
+    start = time.perf_counter()
+    try:
+        if updates:
+            db.session.execute(update(Following), updates)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    result.write_seconds = time.perf_counter() - start
+    return result
+
+
+def store_follows_me(results, batch_size=FOLLOWS_ME_BATCH_SIZE, metrics=None, progress=None):
+    """逐筆接收 (username, follows_me) 並分批寫入，回傳寫入筆數；
+    每批都會提交，中途失敗時已寫入的結果與檢查點進度不會遺失。
+    follows_me 為 None 表示無法判斷，不寫入結果，只在檢查點中記錄為無法判斷"""
+    def flush(batch):
+        written = sum(follows_me is not None for follows_me in batch.values())
+        if metrics is None:
+            update_follows_me(batch, progress=progress)
+            return written
+        with metrics.phase('write'):
+            update_follows_me(batch, progress=progress)
+        metrics.incr('checked', written)
+        return written
+
+    pending = {}
+    total = 0
+    try:
+        for username, follows_me in results:
+            pending[username] = follows_me
+            if len(pending) >= batch_size:
+                batch, pending = pending, {}
+                total += flush(batch)
+    except BaseException:
+        # 檢查中途失敗時仍寫入已取得的結果；寫入失敗只記錄，保留原本的例外
+        try:
+            flush(pending)
+        except Exception as e:
+            logger.error(f"寫入 {len(pending)} 筆未送出的檢查結果失敗: {str(e)}")
+        raise
+    return total + flush(pending)
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import select
+from app.database.models import db, CrawlRun
+
+# /runs 頁面預設顯示的執行次數
+RECENT_RUNS_LIMIT = 100
+
+
+def start_run(kind, now=None):
+    """新增一筆執行中的記錄，讓中途當機的執行也留下痕跡"""
+    run = CrawlRun(kind=kind, status='running', started_at=now or datetime.utcnow())
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+
+def finish_run(run, metrics, status, error=None):
+    """將本次執行的耗時與計數寫回記錄"""
+    run.status = status
+    run.finished_at = datetime.utcnow()
+    run.login_seconds = metrics.timings.get('login')
+    run.scrape_seconds = metrics.timings.get('scrape')
+    run.check_seconds = metrics.timings.get('check')
+    run.write_seconds = metrics.timings.get('write')
+    run.page_load_seconds = metrics.timings.get('page_load')
+    run.navigations = metrics.count('navigations')
+    run.bytes_transferred = metrics.count('bytes')
+    run.scroll_iterations = metrics.count('scroll_iterations')
+    run.scraped_count = metrics.count('scraped')
+    run.checked_count = metrics.count('checked')
+    run.retries = metrics.count('retries')
+    run.failures = metrics.count('failures')
+    run.error = error[:500] if error else None
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+@contextmanager
+def recorded_run(kind, metrics):
+    """記錄一次執行；區塊內將 run.status 設為 'failed' 或拋出例外都會記為失敗"""
+    run = start_run(kind)
+    try:
+        yield run
+    except BaseException as e:
+        # 例外可能來自資料庫寫入，先還原工作階段才能寫入執行記錄
+        db.session.rollback()
+        finish_run(run, metrics, 'failed', str(e) or type(e).__name__)
+        raise
+    finish_run(run, metrics, 'failed' if run.status == 'failed' else 'success', run.error)
+
+
+def recent_runs(limit=RECENT_RUNS_LIMIT):
+    """最近的執行記錄，依時間由舊到新排列方便繪圖"""
+    runs = db.session.execute(
+        select(CrawlRun).order_by(CrawlRun.started_at.desc(), CrawlRun.id.desc()).limit(limit)
+    ).scalars().all()
+    return list(reversed(runs))
@@ -0,0 +1,240 @@
+import fcntl
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.database.models import db, User, Following
+
+# 索引檔每筆固定長度：拍攝時間（微秒）、資料位移、資料長度、帳號數
+INDEX_RECORD = struct.Struct('<qQII')
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_snapshot(rows):
+    """將依 users.id 排序的 (id, follows_me) 編碼為差值 varint 序列加上互相追蹤位元組"""
+    out = bytearray()
+    bits = bytearray((len(rows) + 7) // 8)
+    previous = 0
+    for position, (user_id, follows_me) in enumerate(rows):
+        encode_varint(user_id - previous, out)
+        previous = user_id
+        if follows_me:
+            bits[position >> 3] |= 1 << (position & 7)
+    return bytes(out) + bytes(bits)
+
+
+def decode_ids(buffer, count):
+    """解碼差值 varint 序列，回傳 id 陣列與序列結束的位移"""
+    ids = array('q')
+    value = shift = position = total = 0
+    while len(ids) < count:
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        total += value
+        ids.append(total)
+        value = shift = 0
+    return ids, position
+
+
+class SnapshotEntry:
+    """索引中的一筆快照記錄"""
+
+    def __init__(self, number, taken_at, offset, length, count):
+        self.number = number
+        self.taken_at = taken_at
+        self.offset = offset
+        self.length = length
+        self.count = count
+
+
+class Snapshot:
+    """某次爬取時的追蹤清單：排序的帳號 id 與對應的互相追蹤狀態"""
+
+    def __init__(self, entry, ids, follows_bits):
+        self.entry = entry
+        self.ids = ids
+        self.follows_bits = follows_bits
+
+    @property
+    def taken_at(self):
+        return self.entry.taken_at
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def position(self, user_id):
+        index = bisect_right(self.ids, user_id) - 1
+        return index if index >= 0 and self.ids[index] == user_id else None
+
+    def __contains__(self, user_id):
+        return self.position(user_id) is not None
+
+    def follows_me(self, user_id):
+        index = self.position(user_id)
+        if index is None:
+            return False
+        return bool(self.follows_bits[index >> 3] & (1 << (index & 7)))
+
+    def mutual_ids(self):
+        return [user_id for index, user_id in enumerate(self.ids)
+                if self.follows_bits[index >> 3] & (1 << (index & 7))]
+
+
+class SnapshotDiff:
+    """兩次快照之間的差異（帳號 id）"""
+
+    def __init__(self, before, after):
+        self.before = before
+        self.after = after
+        self.added = []             # 後一次新出現的帳號
+        self.removed = []           # 後一次已不再追蹤的帳號
+        self.started_following = [] # 開始追蹤我的帳號
+        self.stopped_following = [] # 不再追蹤我的帳號
+
+    def summary(self):
+        return (
+            f"新增 {len(self.added)}，移除 {len(self.removed)}，"
+            f"開始互相追蹤 {len(self.started_following)}，不再互相追蹤 {len(self.stopped_following)}"
+        )
+
+
+class SnapshotStore:
+    """只追加的快照檔：snapshots.dat 存放編碼後的快照，snapshots.idx 依時間排序的固定長度索引"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.data_path = os.path.join(directory, 'snapshots.dat')
+        self.index_path = os.path.join(directory, 'snapshots.idx')
+
+    def append(self, rows, taken_at=None):
+        """寫入一次快照；rows 為依 id 排序的 (id, follows_me)，先寫資料再寫索引
+
+        排程器與手動執行的爬蟲可能同時寫入，整個過程持有索引檔的獨占鎖。
+        """
+        payload = encode_snapshot(rows)
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(self.index_path, 'ab') as index:
+            fcntl.flock(index, fcntl.LOCK_EX)
+            # 取得鎖之後才讀取索引，另一個程序可能剛寫入一筆
+            entries = self.entries()
+            taken_at = taken_at or datetime.utcnow()
+            if entries and taken_at < entries[-1].taken_at:
+                raise ValueError("快照時間早於最後一筆快照")
+
+            with open(self.data_path, 'ab') as f:
+                offset = f.tell()
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+            micros = (taken_at - EPOCH) // timedelta(microseconds=1)
+            # 前一次寫入中斷留下的不完整記錄先截掉
+            index.truncate(len(entries) * INDEX_RECORD.size)
+            index.write(INDEX_RECORD.pack(micros, offset, len(payload), len(rows)))
+        return SnapshotEntry(len(entries), taken_at, offset, len(payload), len(rows))
+
+    def entries(self):
+        """讀取索引，忽略尾端不完整的記錄"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return []
+        usable = len(raw) - len(raw) % INDEX_RECORD.size
+        return [
+            SnapshotEntry(number, EPOCH + timedelta(microseconds=micros), offset, length, count)
+            for number, (micros, offset, length, count) in enumerate(INDEX_RECORD.iter_unpack(raw[:usable]))
+        ]
+
+    def find(self, at):
+        """回傳 at 當時最新的快照記錄，之前沒有快照時回傳 None"""
+        entries = self.entries()
+        index = bisect_right([entry.taken_at for entry in entries], at) - 1
+        return entries[index] if index >= 0 else None
+
+    def load(self, entry):
+        """以 mmap 只讀取該筆快照的位元組並解碼"""
+        if not entry.length:
+            return Snapshot(entry, array('q'), b'')
+        with open(self.data_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                buffer = mapped[entry.offset:entry.offset + entry.length]
+        ids, position = decode_ids(buffer, entry.count)
+        return Snapshot(entry, ids, buffer[position:])
+
+    def at(self, when):
+        entry = self.find(when)
+        return self.load(entry) if entry else None
+
+    def diff(self, before, after):
+        """以合併走訪比對兩次排序好的快照"""
+        result = SnapshotDiff(before, after)
+        i = j = 0
+        a, b = before.ids, after.ids
+        while i < len(a) or j < len(b):
+            if j >= len(b) or (i < len(a) and a[i] < b[j]):
+                result.removed.append(a[i])
+                i += 1
+            elif i >= len(a) or b[j] < a[i]:
+                result.added.append(b[j])
+                if after.follows_bits[j >> 3] & (1 << (j & 7)):
+                    result.started_following.append(b[j])
+                j += 1
+            else:
+                was = before.follows_bits[i >> 3] & (1 << (i & 7))
+                now = after.follows_bits[j >> 3] & (1 << (j & 7))
+                if now and not was:
+                    result.started_following.append(b[j])
+                elif was and not now:
+                    result.stopped_following.append(b[j])
+                i += 1
+                j += 1
+        return result
+
+
+def snapshot_store(config):
+    directory = config['SNAPSHOT_DIR'] if 'SNAPSHOT_DIR' in config else None
+    return SnapshotStore(directory) if directory else None
+
+
+def record_snapshot(config, now=None):
+    """將目前追蹤中的帳號與互相追蹤狀態寫成一次快照"""
+    store = snapshot_store(config)
+    if not store:
+        return None
+    rows = db.session.execute(
+        select(Following.user_id, Following.follows_me)
+        .where(Following.current_status == True)
+        .order_by(Following.user_id)
+    ).all()
+    return store.append([(user_id, bool(follows_me)) for user_id, follows_me in rows], now)
+
+
+def usernames_for(ids):
+    """將快照中的帳號 id 換回使用者名稱"""
+    names = {}
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        names.update(db.session.execute(
+            select(User.id, User.username).where(User.id.in_(chunk))
+        ).all())
+    return [names.get(user_id, f'#{user_id}') for user_id in ids]
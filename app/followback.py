@@ -0,0 +1,56 @@
+from app.database.freshness import plan_rechecks
+from app.database.reconcile import apply_followers, update_follows_me
+
+# 互相追蹤的判斷方式
+FOLLOWBACK_MODES = ('followers', 'profile')
+
+
+def plan_followback_checks(crawler, config, forced, logger):
+    """決定互相追蹤狀態，回傳仍需逐一造訪個人頁面檢查的帳號
+
+    followers 模式先蒐集一次自己的粉絲清單並以集合交集更新所有追蹤中的帳號，
+    只有清單不完整而無法判斷的帳號才逐一檢查；蒐集失敗或 profile 模式則全部依檢查計畫逐一檢查。
+    forced 為本次新追蹤或重新追蹤的帳號。
+    """
+    mode = config.get('FOLLOWBACK_MODE', 'followers')
+    if mode not in FOLLOWBACK_MODES:
+        raise ValueError(f"不支援的 FOLLOWBACK_MODE: {mode}")
+    ttl_hours = config.get('FOLLOWS_ME_TTL_HOURS', 72)
+    sample_size = config.get('RECHECK_SAMPLE_SIZE', 20)
+    metrics = crawler.metrics
+
+    if mode == 'followers':
+        with metrics.phase('followers'):
+            followers = crawler.get_followers_list()
+        # 人數為縮寫時沒有精確值，清單一律視為不完整；沒有粉絲時空清單就是完整的結果
+        total = crawler.list_totals.get('followers')
+        if followers or total == 0:
+            result = apply_followers(followers, complete=total is not None and len(followers) >= total)
+            metrics.add_time('write', result.write_seconds)
+            logger.info(f"粉絲清單比對完成: {result.summary()}")
+            if not result.ambiguous:
+                return []
+
+            # 只在無法判斷的帳號中依檢查計畫挑選需要逐一檢查的帳號
+            ambiguous = set(result.ambiguous)
+            plan = plan_rechecks([username for username in forced if username in ambiguous],
+                                 ttl_hours, sample_size)
+            usernames = [username for username in plan.usernames if username in ambiguous]
+            logger.info(f"粉絲清單不完整，逐一檢查 {len(usernames)} 個帳號")
+            return usernames
+        logger.warning("蒐集粉絲清單失敗，改為逐一檢查個人頁面")
+
+    # 網路擷取的回應若已包含是否追蹤我，這些帳號不需要再造訪個人頁面
+    captured = {
+        username: user['followed_by']
+        for username, user in crawler.captured_users.get('following', {}).items()
+        if user['followed_by'] is not None
+    }
+    if captured:
+        update_follows_me(captured)
+        forced = [username for username in forced if username not in captured]
+        logger.info(f"已從名單 API 回應取得 {len(captured)} 個帳號的互相追蹤狀態")
+
+    plan = plan_rechecks(forced, ttl_hours, sample_size)
+    logger.info(f"互相追蹤檢查計畫: {plan.summary()}")
+    return [username for username in plan.usernames if username not in captured]
@@ -1,8 +1,17 @@
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime
 from jinja2 import Environment, FileSystemLoader
-from app.database.models import Following, FollowHistory, db
+from sqlalchemy import select, func, case
+from app.database.models import User, Following, FollowHistory, db
+
+# 串流模式下每次從資料庫取出的列數
+STREAM_BATCH_SIZE = 1000
+RECENT_EVENTS_LIMIT = 50
+
+# 報告依序由這些區塊組成，各自對應 templates/sections/ 下的模板
+SECTIONS = ('summary', 'events', 'following', 'raw')
 
 class ReportGenerator:
     def __init__(self, app):
@@ -10,48 +19,254 @@ class ReportGenerator:
         template_dir = os.path.join(os.path.dirname(__file__), 'templates')
         self.env = Environment(loader=FileSystemLoader(template_dir))
         
-    def generate_report(self, output_path='reports/report.html'):
+    def generate_report(self, output_path='reports/report.html', streaming=None, json_sidecar=None, force=False):
+        """生成報告；串流模式下資料未變動時略過，只重新渲染資料有變動的區塊"""
+        self.last_run = {'skipped': False, 'rendered': list(SECTIONS)}
+        if streaming is None:
+            streaming = self.app.config.get('REPORT_STREAMING', True)
+        if json_sidecar is None:
+            json_sidecar = self.app.config.get('REPORT_JSON_SIDECAR', False)
+
         with self.app.app_context():
-            # 獲取所有追蹤資料
-            following_data = Following.query.all()
-            history_data = FollowHistory.query.order_by(FollowHistory.event_date.desc()).all()
-            
-            # 準備報告數據
-            report_data = {
-                'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'total_following': len(following_data),
-                'active_following': len([f for f in following_data if f.current_status]),
-                'mutual_following': len([f for f in following_data if f.follows_me]),
-                'following_list': [
-                    {
-                        'username': f.username,
-                        'follows_me': f.follows_me,
-                        'first_seen': f.first_seen.strftime('%Y-%m-%d'),
-                        'last_seen': f.last_seen.strftime('%Y-%m-%d'),
-                        'current_status': f.current_status
-                    } for f in following_data
-                ],
-                'recent_events': [
-                    {
-                        'username': h.username,
-                        'event_type': h.event_type,
-                        'event_date': h.event_date.strftime('%Y-%m-%d %H:%M:%S')
-                    } for h in history_data[:50]  # 最近50筆事件
-                ]
-            }
-            
             # 確保輸出目錄存在
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # 渲染模板
-            template = self.env.get_template('report.html')
-            html_content = template.render(
-                report=report_data,
-                report_json=json.dumps(report_data, ensure_ascii=False, indent=2)
-            )
-            
-            # 寫入檔案
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+            with self._read_snapshot():
+                if streaming:
+                    self._generate_incremental(output_path, json_sidecar, force)
+                else:
+                    self._generate_in_memory(output_path)
+
             return output_path
+
+    @contextmanager
+    def _read_snapshot(self):
+        """在同一個 SQLite 讀取交易中執行所有查詢
+
+        追蹤清單會分別為表格與原始資料讀取，sqlite3 預設不會為 SELECT 開啟交易，
+        爬蟲在兩次讀取之間提交時兩個區塊的內容就會不一致。
+        """
+        connection = db.session.connection()
+        if connection.connection.dbapi_connection.in_transaction:
+            # 已經在交易中，查詢本來就一致
+            yield
+            return
+        connection.exec_driver_sql('BEGIN')
+        try:
+            yield
+        finally:
+            db.session.rollback()
+
+    def _generate_in_memory(self, output_path):
+        """一次載入所有資料後渲染（舊版行為）"""
+        # 獲取所有追蹤資料
+        following_data = Following.query.all()
+        history_data = FollowHistory.query.order_by(FollowHistory.event_date.desc()).all()
+        
+        # 準備報告數據
+        report_data = {
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'total_following': len(following_data),
+            'active_following': len([f for f in following_data if f.current_status]),
+            'mutual_following': len([f for f in following_data if f.follows_me]),
+            'following_list': [
+                {
+                    'username': f.username,
+                    'follows_me': f.follows_me,
+                    'first_seen': f.first_seen.strftime('%Y-%m-%d'),
+                    'last_seen': f.last_seen.strftime('%Y-%m-%d'),
+                    'current_status': f.current_status
+                } for f in following_data
+            ],
+            'recent_events': [
+                {
+                    'username': h.username,
+                    'event_type': h.event_type,
+                    'event_date': h.event_date.strftime('%Y-%m-%d %H:%M:%S')
+                } for h in history_data[:RECENT_EVENTS_LIMIT]  # 最近50筆事件
+            ]
+        }
+        
+        # 渲染模板
+        context = {
+            'report': report_data,
+            'report_json': [json.dumps(report_data, ensure_ascii=False, indent=2)],
+            'report_json_url': None,
+        }
+        sections = {
+            name: [self.env.get_template(f'sections/{name}.html').render(**context)]
+            for name in SECTIONS
+        }
+        html_content = self.env.get_template('report.html').render(report=report_data, sections=sections)
+        
+        # 寫入檔案
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+
+    def _summary(self):
+        """以 SQL 計算統計數字"""
+        total, active, mutual = db.session.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(case((Following.current_status == True, 1), else_=0)), 0),
+                func.coalesce(func.sum(case((Following.follows_me == True, 1), else_=0)), 0),
+            ).select_from(Following)
+        ).one()
+        return {
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'total_following': total,
+            'active_following': active,
+            'mutual_following': mutual,
+        }
+
+    def _recent_events(self):
+        rows = db.session.execute(
+            select(User.username, FollowHistory.event_type, FollowHistory.event_date)
+            .join(FollowHistory.user)
+            .order_by(FollowHistory.event_date.desc(), FollowHistory.id.desc())
+            .limit(RECENT_EVENTS_LIMIT)
+        )
+        return [
+            {
+                'username': username,
+                'event_type': event_type,
+                'event_date': event_date.strftime('%Y-%m-%d %H:%M:%S')
+            } for username, event_type, event_date in rows
+        ]
+
+    def _iter_following(self):
+        """以 yield_per 分批讀取追蹤清單，逐筆產生報告用的字典"""
+        rows = db.session.execute(
+            select(
+                User.username, Following.follows_me, Following.first_seen,
+                Following.last_seen, Following.current_status
+            ).join(Following.user).order_by(Following.id).execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        for username, follows_me, first_seen, last_seen, current_status in rows:
+            yield {
+                'username': username,
+                'follows_me': follows_me,
+                'first_seen': first_seen.strftime('%Y-%m-%d'),
+                'last_seen': last_seen.strftime('%Y-%m-%d'),
+                'current_status': current_status
+            }
+
+    def _iter_json(self, summary, recent_events):
+        """逐段產生精簡格式的報告 JSON"""
+        dumps = lambda value: json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        yield dumps(summary)[:-1] + ',"following_list":['
+        for index, row in enumerate(self._iter_following()):
+            yield (',' if index else '') + dumps(row)
+        yield '],"recent_events":' + dumps(recent_events) + '}'
+
+    def _template_mtime(self, name):
+        return os.path.getmtime(os.path.join(os.path.dirname(__file__), 'templates', name))
+
+    def _sidecar_path(self, output_path):
+        return os.path.splitext(output_path)[0] + '.json'
+
+    def _fingerprints(self, summary, json_sidecar):
+        """以少量彙總查詢與模板修改時間組成各區塊的資料指紋"""
+        history = db.session.execute(
+            select(func.count(), func.max(FollowHistory.id))
+        ).one()
+        following = db.session.execute(
+            select(
+                func.count(), func.max(Following.id), func.max(Following.last_seen),
+                func.max(Following.follows_me_checked_at),
+                func.sum(case((Following.current_status == True, 1), else_=0)),
+                func.sum(case((Following.follows_me == True, 1), else_=0)),
+            )
+        ).one()
+
+        counts = {key: value for key, value in summary.items() if key != 'generated_at'}
+        fingerprints = {
+            'summary': [counts],
+            'events': [history],
+            'following': [following],
+        }
+        fingerprints['raw'] = [fingerprints['summary'], history, following, bool(json_sidecar)]
+        for name in SECTIONS:
+            fingerprints[name].append(self._template_mtime(f'sections/{name}.html'))
+        fingerprints['layout'] = [self._template_mtime('report.html')]
+        # 轉成可寫入 JSON 並可直接比較的格式
+        return json.loads(json.dumps(fingerprints, default=str))
+
+    def _render_to_file(self, template_name, path, **context):
+        """串流渲染到暫存檔後再替換，避免中途失敗留下不完整的檔案"""
+        stream = self.env.get_template(template_name).stream(**context)
+        stream.enable_buffering(size=100)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            stream.dump(f)
+        os.replace(tmp_path, path)
+
+    def _iter_file(self, path, chunk_size=65536):
+        with open(path, 'r', encoding='utf-8') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def _section_context(self, name, summary, output_path, json_sidecar):
+        """各區塊渲染時需要的資料，只在該區塊需要重新渲染時才查詢"""
+        if name == 'summary':
+            return {'report': summary}
+        if name == 'events':
+            return {'report': {'recent_events': self._recent_events()}}
+        if name == 'following':
+            return {'report': {'following_list': self._iter_following()}}
+
+        # 原始資料會被快取，不包含生成時間；生成時間只顯示在每次都會重新渲染的版面中
+        counts = {key: value for key, value in summary.items() if key != 'generated_at'}
+        report_json = self._iter_json(counts, self._recent_events())
+        if not json_sidecar:
+            return {'report_json': report_json, 'report_json_url': None}
+
+        # 原始資料另存成同名 JSON 檔，HTML 只放連結
+        json_path = self._sidecar_path(output_path)
+        with open(json_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.writelines(report_json)
+        os.replace(json_path + '.tmp', json_path)
+        return {'report_json': [], 'report_json_url': os.path.basename(json_path)}
+
+    def _generate_incremental(self, output_path, json_sidecar, force):
+        """以 SQL 計算統計、分批讀取資料並直接串流渲染到檔案；未變動的區塊沿用上次的結果"""
+        summary = self._summary()
+        fingerprints = self._fingerprints(summary, json_sidecar)
+        # 另存的 JSON 檔被刪除時，即使資料沒有變動也要重新產生原始資料區塊
+        sidecar_missing = json_sidecar and not os.path.exists(self._sidecar_path(output_path))
+
+        # 各區塊的渲染結果與指紋快取在報告旁的隱藏目錄
+        output_dir = os.path.dirname(output_path) or '.'
+        cache_dir = os.path.join(output_dir, '.report_cache', os.path.basename(output_path))
+        manifest_path = os.path.join(cache_dir, 'manifest.json')
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        if not force and os.path.exists(output_path) and not sidecar_missing and manifest == fingerprints:
+            self.last_run = {'skipped': True, 'rendered': []}
+            return
+
+        rendered = []
+        for name in SECTIONS:
+            fragment = os.path.join(cache_dir, f'{name}.html')
+            stale = manifest.get(name) != fingerprints[name] or not os.path.exists(fragment)
+            if force or stale or (name == 'raw' and sidecar_missing):
+                context = self._section_context(name, summary, output_path, json_sidecar)
+                self._render_to_file(f'sections/{name}.html', fragment, **context)
+                rendered.append(name)
+
+        sections = {
+            name: self._iter_file(os.path.join(cache_dir, f'{name}.html')) for name in SECTIONS
+        }
+        self._render_to_file('report.html', output_path, report=summary, sections=sections)
+
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(fingerprints, f)
+        self.last_run = {'skipped': False, 'rendered': rendered}
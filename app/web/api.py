@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from flask import Blueprint, Response, request, abort, current_app, jsonify, stream_with_context
+from sqlalchemy import select
+from app.database.generation import generation_path, read_generation
+from app.database.models import db, User, Following
+from app.web.pagination import parse_history_filters, history_query, apply_cursor, encode_cursor
+from app.web.routes import dashboard_stats
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+API_MAX_PAGE_SIZE = 5000
+API_DEFAULT_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+
+FOLLOWING_FIELDS = ('id', 'username', 'instagram_id', 'follows_me', 'current_status', 'first_seen',
+                    'last_seen', 'follows_me_checked_at')
+HISTORY_FIELDS = ('id', 'username', 'event_type', 'event_date')
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _parse_fields(allowed):
+    """解析 fields 參數，未指定時回傳全部欄位"""
+    value = request.args.get('fields')
+    if not value:
+        return list(allowed)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = set(fields) - set(allowed)
+    if unknown or not fields:
+        abort(400, description=f"不支援的欄位: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def _parse_limit():
+    try:
+        value = int(request.args.get('limit', API_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        abort(400)
+    return max(1, min(value, API_MAX_PAGE_SIZE))
+
+
+def _last_crawl():
+    """最後一次爬蟲完成的時間（資料世代檔案的修改時間）"""
+    path = generation_path(current_app.config)
+    try:
+        return datetime.utcfromtimestamp(int(os.path.getmtime(path)))
+    except (OSError, TypeError):
+        return None
+
+
+def _validators():
+    """依資料世代與請求內容產生 ETag 與 Last-Modified"""
+    generation = read_generation(current_app.config)
+    digest = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:16]
+    return f'{generation}-{digest}', _last_crawl()
+
+
+def _not_modified(etag, last_modified):
+    """資料未變動時直接回傳 304，不查詢資料庫"""
+    if request.if_none_match:
+        modified = not request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified:
+        modified = last_modified > request.if_modified_since.replace(tzinfo=None)
+    else:
+        return None
+    if modified:
+        return None
+    response = Response(status=304)
+    _set_validators(response, etag, last_modified)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def _stream_page(rows, fields, limit, cursor_of):
+    """逐筆輸出 JSON，不在記憶體中組出整個結果；多取的一筆只用來判斷是否有下一頁"""
+    def generate():
+        yield '{"items":['
+        count = 0
+        last = None
+        has_more = False
+        for row in rows:
+            if count == limit:
+                has_more = True
+                continue
+            item = {field: _serialize(row[field]) for field in fields}
+            yield (',' if count else '') + json.dumps(item, ensure_ascii=False)
+            last = row
+            count += 1
+        next_cursor = cursor_of(last) if has_more else None
+        yield f'],"count":{count},"next_cursor":{json.dumps(next_cursor)}}}'
+
+    return generate()
+
+
+def _streaming_response(generator, etag, last_modified):
+    response = Response(stream_with_context(generator), mimetype='application/json')
+    return _set_validators(response, etag, last_modified)
+
+
+@api.route('/stats')
+def stats():
+    """追蹤統計"""
+    etag, last_modified = _validators()
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+
+    payload = dashboard_stats()
+    payload['generation'] = read_generation(current_app.config)
+    payload['last_crawl'] = _serialize(last_modified)
+    return _set_validators(jsonify(payload), etag, last_modified)
+
+
+@api.route('/following')
+def following():
+    """追蹤清單：依 id 游標分頁，可用 status（active/inactive/all）與 follows_me 篩選"""
+    fields = _parse_fields(FOLLOWING_FIELDS)
+    limit = _parse_limit()
+    etag, last_modified = _validators()
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+
+    # 游標需要 id，即使沒有要求輸出也一併查詢
+    columns = [
+        getattr(User, field) if field in ('username', 'instagram_id') else getattr(Following, field)
+        for field in dict.fromkeys(fields + ['id'])
+    ]
+    query = select(*columns).select_from(Following).join(Following.user).order_by(Following.id.asc())
+
+    status = request.args.get('status', 'active')
+    if status == 'active':
+        query = query.where(Following.current_status == True)
+    elif status == 'inactive':
+        query = query.where(Following.current_status == False)
+    elif status != 'all':
+        abort(400, description=f"不支援的狀態: {status}")
+
+    follows_me = request.args.get('follows_me')
+    if follows_me is not None:
+        if follows_me not in ('true', 'false'):
+            abort(400)
+        query = query.where(Following.follows_me == (follows_me == 'true'))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = query.where(Following.id > int(cursor))
+        except ValueError:
+            abort(400)
+
+    def rows():
+        result = db.session.execute(
+            query.limit(limit + 1).execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        for row in result:
+            yield row._mapping
+
+    generator = _stream_page(rows(), fields, limit, lambda row: str(row['id']))
+    return _streaming_response(generator, etag, last_modified)
+
+
+@api.route('/history')
+def history():
+    """追蹤變動歷史：與 /history 相同的篩選條件與 (event_date, id) 游標"""
+    fields = _parse_fields(HISTORY_FIELDS)
+    limit = _parse_limit()
+    try:
+        filters = parse_history_filters(request.args)
+        query = apply_cursor(history_query(filters), request.args.get('cursor'))
+    except ValueError:
+        abort(400)
+
+    etag, last_modified = _validators()
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+
+    def rows():
+        for event in query.limit(limit + 1).yield_per(STREAM_BATCH_SIZE):
+            yield {field: getattr(event, field) for field in HISTORY_FIELDS}
+
+    generator = _stream_page(
+        rows(), fields, limit, lambda row: encode_cursor(row['event_date'], row['id'])
+    )
+    return _streaming_response(generator, etag, last_modified)
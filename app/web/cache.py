@@ -0,0 +1,40 @@
+import threading
+import time
+
+
+class GenerationCache:
+    """以資料世代編號失效的快取：世代不變且未超過存活時間時直接回傳上次的結果"""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._generation = None
+        self._value = None
+        self._built_at = 0.0
+
+    def get(self, generation, build):
+        with self._lock:
+            if (self._generation == generation
+                    and time.monotonic() - self._built_at < self.ttl):
+                self.hits += 1
+                return self._value
+            self.misses += 1
+
+        value = build()
+        with self._lock:
+            self._generation = generation
+            self._value = value
+            self._built_at = time.monotonic()
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'generation': self._generation,
+            }
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import contains_eager
+from app.database.models import User, FollowHistory
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+EVENT_TYPES = ('new_follow', 'unfollow')
+
+
+def encode_cursor(event_date, event_id):
+    """以最後一筆的 (event_date, id) 作為下一頁的游標"""
+    return f'{event_date.isoformat()}_{event_id}'
+
+
+def decode_cursor(cursor):
+    """解析游標，格式錯誤時拋出 ValueError"""
+    event_date, event_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(event_date), int(event_id)
+
+
+def parse_page_size(value):
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def parse_history_filters(args):
+    """從查詢參數取得篩選條件：type、q（帳號前綴）、start、end（YYYY-MM-DD）"""
+    filters = {
+        'type': args.get('type') or None,
+        'q': (args.get('q') or '').strip().lstrip('@') or None,
+        'start': args.get('start') or None,
+        'end': args.get('end') or None,
+    }
+    if filters['type'] and filters['type'] not in EVENT_TYPES:
+        raise ValueError(f"不支援的事件類型: {filters['type']}")
+    for key in ('start', 'end'):
+        if filters[key]:
+            datetime.strptime(filters[key], '%Y-%m-%d')
+    return filters
+
+
+def history_query(filters):
+    """依篩選條件建立歷史記錄查詢，依 (event_date, id) 由新到舊排序"""
+    # 帳號名稱由同一個 JOIN 載入，篩選帳號前綴時也使用它
+    query = FollowHistory.query.join(FollowHistory.user).options(contains_eager(FollowHistory.user))
+    if filters.get('type'):
+        query = query.filter(FollowHistory.event_type == filters['type'])
+    if filters.get('q'):
+        query = query.filter(User.username.startswith(filters['q'], autoescape=True))
+    if filters.get('start'):
+        query = query.filter(FollowHistory.event_date >= datetime.strptime(filters['start'], '%Y-%m-%d'))
+    if filters.get('end'):
+        end = datetime.strptime(filters['end'], '%Y-%m-%d') + timedelta(days=1)
+        query = query.filter(FollowHistory.event_date < end)
+    return query.order_by(FollowHistory.event_date.desc(), FollowHistory.id.desc())
+
+
+def apply_cursor(query, cursor):
+    """只保留排在游標之後（較舊）的記錄"""
+    if not cursor:
+        return query
+    event_date, event_id = decode_cursor(cursor)
+    return query.filter(or_(
+        FollowHistory.event_date < event_date,
+        and_(FollowHistory.event_date == event_date, FollowHistory.id < event_id)
+    ))
+
+
+def keyset_page(query, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """以 keyset 分頁取出一頁，回傳 (rows, next_cursor)"""
+    query = apply_cursor(query, cursor)
+
+    # 多取一筆判斷是否還有下一頁
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].event_date, rows[-1].id)
+    return rows, next_cursor
@@ -1,51 +1,115 @@
-from flask import Blueprint, render_template
-from app.database.models import Following, FollowHistory
+from flask import Blueprint, render_template, request, abort, make_response, current_app, jsonify
+from sqlalchemy import select, func
+from app.database.generation import read_generation
+from app.database.models import db, User, Following, FollowHistory
+from app.database.runs import recent_runs
+from app.web.pagination import parse_history_filters, parse_page_size, history_query, keyset_page
 from datetime import datetime
 
-web = Blueprint('web', __name__)
+web = Blueprint('web', __name__, template_folder='templates')
 
-@web.route('/')
-def index():
-    """首頁 - 顯示追蹤統計和單向追蹤清單"""
-    # 獲取統計數據
-    total_following = Following.query.filter_by(current_status=True).count()
-    mutual_following = Following.query.filter_by(
-        current_status=True,
-        follows_me=True
-    ).count()
-    one_way_following = Following.query.filter_by(
-        current_status=True,
-        follows_me=False
-    ).count()
+def dashboard_stats():
+    """以單一分組查詢計算追蹤統計"""
+    rows = db.session.execute(
+        select(Following.follows_me, func.count())
+        .where(Following.current_status == True)
+        .group_by(Following.follows_me)
+    ).all()
+    counts = {follows_me: count for follows_me, count in rows}
+    return {
+        'total_following': sum(counts.values()),
+        'mutual_following': counts.get(True, 0),
+        'one_way_following': counts.get(False, 0),
+    }
+
+def build_dashboard():
+    """查詢首頁需要的所有資料，轉成不依賴資料庫工作階段的字典"""
+    payload = dashboard_stats()
 
     # 獲取單向追蹤清單
-    one_way_users = Following.query.filter_by(
-        current_status=True,
-        follows_me=False
-    ).order_by(Following.first_seen.desc()).all()
+    payload['one_way_users'] = [
+        {'username': username, 'first_seen': first_seen, 'last_seen': last_seen}
+        for username, first_seen, last_seen in db.session.execute(
+            select(User.username, Following.first_seen, Following.last_seen)
+            .join(Following.user)
+            .where(Following.current_status == True, Following.follows_me == False)
+            .order_by(Following.first_seen.desc())
+        )
+    ]
 
     # 獲取最近的變動記錄
-    recent_changes = FollowHistory.query.order_by(
-        FollowHistory.event_date.desc()
-    ).limit(10).all()
+    payload['recent_changes'] = [
+        {'username': username, 'event_type': event_type, 'event_date': event_date}
+        for username, event_type, event_date in db.session.execute(
+            select(User.username, FollowHistory.event_type, FollowHistory.event_date)
+            .join(FollowHistory.user)
+            .order_by(FollowHistory.event_date.desc(), FollowHistory.id.desc())
+            .limit(10)
+        )
+    ]
+    return payload
+
+@web.route('/')
+def index():
+    """首頁 - 顯示追蹤統計和單向追蹤清單；資料在爬蟲完成前都從快取取得"""
+    cache = current_app.extensions['dashboard_cache']
+    payload = cache.get(read_generation(current_app.config), build_dashboard)
 
     return render_template('dashboard.html',
-        total_following=total_following,
-        mutual_following=mutual_following,
-        one_way_following=one_way_following,
-        one_way_users=one_way_users,
-        recent_changes=recent_changes,
-        current_time=datetime.now()
+        current_time=datetime.now(),
+        **payload
     )
 
+@web.route('/stats/cache')
+def cache_stats():
+    """首頁快取命中統計"""
+    return jsonify(current_app.extensions['dashboard_cache'].stats())
+
 @web.route('/history')
 def history():
-    """歷史記錄頁面"""
-    changes = FollowHistory.query.order_by(
-        FollowHistory.event_date.desc()
-    ).all()
-    
+    """歷史記錄頁面 - 以 (event_date, id) keyset 分頁，可依類型、帳號前綴與日期篩選"""
+    try:
+        filters = parse_history_filters(request.args)
+        limit = parse_page_size(request.args.get('limit'))
+        changes, next_cursor = keyset_page(
+            history_query(filters), request.args.get('cursor'), limit
+        )
+    except ValueError:
+        abort(400)
+
+    # 「載入更多」只回傳表格列，下一頁游標放在標頭
+    if request.args.get('partial'):
+        response = make_response(render_template('history_rows.html', changes=changes))
+        response.headers['X-Next-Cursor'] = next_cursor or ''
+        return response
+
     return render_template('history.html',
         changes=changes,
+        filters=filters,
+        next_cursor=next_cursor,
+        current_time=datetime.now()
+    )
+
+@web.route('/runs')
+def runs():
+    """爬蟲執行記錄 - 各階段耗時與檢查速度的趨勢"""
+    records = recent_runs()
+    chart = [
+        {
+            'started_at': run.started_at.strftime('%m-%d %H:%M'),
+            'kind': run.kind,
+            'login': run.login_seconds,
+            'scrape': run.scrape_seconds,
+            'check': run.check_seconds,
+            'write': run.write_seconds,
+            'users_per_second': run.users_per_second,
+            'kb_per_navigation': run.kb_per_navigation,
+            'load_per_navigation': run.load_seconds_per_navigation,
+            'failures': run.failures,
+        } for run in records
+    ]
+    return render_template('runs.html',
+        runs=list(reversed(records)),
+        chart=chart,
         current_time=datetime.now()
     )
@@ -0,0 +1,102 @@
+"""以模擬伺服器端對端測量 InstagramCrawler 的效能
+
+比較兩種互相追蹤判斷方式：逐一造訪個人頁面（check_follows_me）與一次蒐集粉絲清單（get_followers_list）。
+
+用法: python benchmarks/bench_crawler.py [追蹤人數 ...] [--latency 毫秒] [--checks N] [--capture dom|network] [--profile lean|full]
+預設以 100、1,000 與 10,000 個追蹤帳號各測一次，需要可執行的 Chrome（以 headless 模式啟動）。
+可用 CHROME_DRIVER_PATH 環境變數指定 ChromeDriver。
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_instagram import FakeInstagram, FakeInstagramServer  # noqa: E402
+
+
+def crawler_config(base_url, fake, workdir, capture_mode='dom', browser_profile='lean'):
+    """只包含爬蟲需要的設定，不讀取 .env 的帳號或登入狀態"""
+    return {
+        'INSTAGRAM_BASE_URL': base_url,
+        'INSTAGRAM_USERNAME': fake.owner,
+        'INSTAGRAM_PASSWORD': fake.password,
+        'CAPTURE_MODE': capture_mode,
+        'BROWSER_PROFILE': browser_profile,
+        'HEADLESS_MODE': True,
+        'CHROME_DRIVER_PATH': os.getenv('CHROME_DRIVER_PATH'),
+        'DRIVER_CACHE_DIR': os.getenv('DRIVER_CACHE_DIR', os.path.join('data', 'drivers')),
+        'SESSION_FILE': None,
+        'DELAY_BETWEEN_REQUESTS': 0,
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING'),
+        'LOG_FILE': os.path.join(workdir, 'bench.log'),
+    }
+
+
+def timed(fake, func):
+    """回傳 (結果, 耗時, 期間的請求次數)"""
+    fake.reset()
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start, fake.stats()
+
+
+def run(size, latency_ms, checks, capture_mode='dom', browser_profile='lean'):
+    from app.crawler.instagram import InstagramCrawler
+
+    fake = FakeInstagram(following=size, latency_ms=latency_ms)
+    with FakeInstagramServer(fake) as server, tempfile.TemporaryDirectory() as workdir:
+        crawler = InstagramCrawler(crawler_config(server.url, fake, workdir, capture_mode, browser_profile))
+        try:
+            crawler.init_driver()
+            logged_in, login_time, login_rpc = timed(fake, crawler.login)
+            if not logged_in:
+                raise RuntimeError("登入模擬伺服器失敗")
+
+            following, scrape_time, scrape_rpc = timed(fake, crawler.get_following_list)
+            scroll_iterations = crawler.metrics.count('scroll_iterations')
+
+            sample = [fake.username(i) for i in range(min(checks, size))]
+            results, check_time, check_rpc = timed(
+                fake, lambda: {username: crawler.check_follows_me(username) for username in sample}
+            )
+            correct = sum(results[username] == fake.follows_me(username) for username in sample)
+
+            followers, followers_time, followers_rpc = timed(fake, crawler.get_followers_list)
+            follower_set = set(followers)
+            bulk_correct = sum(
+                (username in follower_set) == fake.follows_me(username) for username in following
+            )
+        finally:
+            crawler.close()
+
+    print(f"{size} 個追蹤帳號（每個請求延遲 {latency_ms:g} ms，{capture_mode} 模式，{browser_profile} 瀏覽器設定）")
+    print(f"  login              {login_time:8.2f} s  請求 {login_rpc}")
+    print(f"  get_following_list {scrape_time:8.2f} s  請求 {scrape_rpc}  "
+          f"蒐集 {len(following)}/{size}  滾動 {scroll_iterations} 次")
+    if sample:
+        print(f"  check_follows_me   {check_time:8.2f} s  請求 {check_rpc}  "
+              f"{len(sample) / check_time:.2f} 帳號/秒  正確 {correct}/{len(sample)}")
+    print(f"  get_followers_list {followers_time:8.2f} s  請求 {followers_rpc}  "
+          f"蒐集 {len(followers)} 位粉絲  交集判斷正確 {bulk_correct}/{len(following)}")
+    navigations = crawler.metrics.count('navigations')
+    if navigations:
+        print(f"  頁面載入           {crawler.metrics.time('page_load') / navigations:8.2f} s/次  "
+              f"{crawler.metrics.count('bytes') / 1024 / navigations:.0f} KB/次  共 {navigations} 次")
+    print(f"  啟動               {sum(crawler.startup_timings.values()):8.2f} s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='InstagramCrawler 端對端效能測試')
+    parser.add_argument('sizes', nargs='*', type=int, default=[100, 1000, 10000])
+    parser.add_argument('--latency', type=float, default=0, help='模擬伺服器每個請求的延遲（毫秒）')
+    parser.add_argument('--checks', type=int, default=20, help='測試 check_follows_me 的帳號數')
+    parser.add_argument('--capture', choices=('dom', 'network'), default='dom', help='名單蒐集方式')
+    parser.add_argument('--profile', choices=('lean', 'full'), default='lean', help='瀏覽器設定')
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # 不輸出每個請求的存取記錄
+    for size in args.sizes:
+        run(size, args.latency, args.checks, args.capture, args.profile)
@@ -0,0 +1,107 @@
+"""首頁與歷史頁查詢在建立索引前後的延遲比較
+
+用法: python benchmarks/bench_dashboard_queries.py [列數 ...]
+預設以 10,000 與 100,000 筆資料各測一次，資料庫建立在暫存目錄。
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text  # noqa: E402
+
+REPEAT = 20
+
+
+def populate(db, User, Following, FollowHistory, rows):
+    """產生 rows 筆追蹤資料與兩倍數量的歷史事件"""
+    now = datetime.utcnow()
+    users = [{'id': i + 1, 'username': f'user{i:07d}'} for i in range(rows)]
+    following = [
+        {
+            'user_id': i + 1,
+            'follows_me': random.random() < 0.6,
+            'current_status': random.random() < 0.9,
+            'first_seen': now - timedelta(minutes=random.randint(0, 500000)),
+            'last_seen': now,
+        } for i in range(rows)
+    ]
+    history = [
+        {
+            'user_id': random.randrange(rows) + 1,
+            'event_type': random.choice(('new_follow', 'unfollow')),
+            'event_date': now - timedelta(minutes=random.randint(0, 500000)),
+        } for _ in range(rows * 2)
+    ]
+    db.session.execute(insert(User), users)
+    db.session.execute(insert(Following), following)
+    db.session.execute(insert(FollowHistory), history)
+    db.session.commit()
+
+
+def dashboard_queries(User, Following, FollowHistory, probe):
+    """與 routes.index 及爬蟲相同的查詢"""
+    return {
+        'counts': lambda: (
+            Following.query.filter_by(current_status=True).count(),
+            Following.query.filter_by(current_status=True, follows_me=True).count(),
+            Following.query.filter_by(current_status=True, follows_me=False).count(),
+        ),
+        'one_way': lambda: Following.query.filter_by(current_status=True, follows_me=False)
+            .order_by(Following.first_seen.desc()).limit(50).all(),
+        'recent': lambda: FollowHistory.query.order_by(FollowHistory.event_date.desc()).limit(10).all(),
+        'lookup': lambda: Following.query.join(Following.user).filter(User.username == probe).first(),
+    }
+
+
+def measure(User, Following, FollowHistory, probe):
+    """回傳每個查詢的中位數延遲"""
+    result = {}
+    for name, query in dashboard_queries(User, Following, FollowHistory, probe).items():
+        timings = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        result[name] = timings[len(timings) // 2]
+    return result
+
+
+def run(rows):
+    import main
+    from config import Config
+    Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from app.database.models import db, User, Following, FollowHistory
+    from app.database.migrations import INDEXES, upgrade_schema
+
+    app = main.create_app()
+    with app.app_context():
+        populate(db, User, Following, FollowHistory, rows)
+        probe = f'user{rows - 1:07d}'  # 依帳號查詢時位於資料表尾端的帳號
+
+        # 模擬舊版資料庫：移除所有索引
+        for name, *_ in INDEXES:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        db.session.commit()
+        before = measure(User, Following, FollowHistory, probe)
+        db.session.commit()
+
+        start = time.perf_counter()
+        upgrade_schema(db.engine)
+        migrate = time.perf_counter() - start
+        after = measure(User, Following, FollowHistory, probe)
+
+    print(f"{rows} 筆（遷移耗時 {migrate * 1000:.1f} ms）")
+    for name in before:
+        print(f"  {name:<8} 建立索引前 {before[name] * 1000:8.2f} ms  建立索引後 {after[name] * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,285 @@
+"""離線測試用的 Instagram 模擬伺服器
+
+提供登入表單、個人頁面與會在滾動時分批載入的追蹤中／粉絲對話框，
+頁面結構只模擬 InstagramCrawler 依賴的部分。可設定追蹤人數、每批筆數與回應延遲，
+並統計各類請求次數。
+
+用法: python benchmarks/fake_instagram.py [--following N] [--page-size N] [--latency 毫秒] [--port 埠號]
+爬蟲設定 INSTAGRAM_BASE_URL=http://127.0.0.1:<埠號>/ 即可改連到這裡。
+"""
+import argparse
+import html
+import threading
+import time
+from collections import Counter
+from flask import Flask, request, redirect, jsonify, make_response, abort
+from werkzeug.serving import make_server
+
+OWNER_ID = 1
+SESSION_COOKIE = 'sessionid'
+
+PAGE = """<!DOCTYPE html>
+<html lang="zh-TW">
+<head>
+<meta charset="UTF-8">
+<title>Instagram</title>
+<style>
+    body {{ font-family: sans-serif; margin: 0; }}
+    div[role='dialog'] {{ position: fixed; top: 10%; left: 30%; width: 40%; background: #fff;
+                         border: 1px solid #ccc; }}
+    .list {{ height: 400px; overflow-y: auto; }}
+    .row {{ height: 54px; display: flex; align-items: center; padding: 0 16px; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+LOGIN_FORM = """
+<form method="post" action="/accounts/login/">
+    <input name="username" type="text">
+    <input name="password" type="password">
+    <button type="submit">登入</button>
+</form>
+"""
+
+HOME = """
+<main><h1>首頁</h1></main>
+<div id="popup"><button class="_a9-- _ap36 _a9_1" onclick="this.parentNode.remove()">稍後再說</button></div>
+"""
+
+PROFILE = """
+<header>
+    <h2>{username}</h2>
+    <ul>
+        <li><a href="/{username}/followers/" class="list-link" data-kind="followers"><span><span>{followers}</span></span> 位粉絲</a></li>
+        <li><a href="/{username}/following/" class="list-link" data-kind="following"><span><span>{following}</span></span> 追蹤中</a></li>
+    </ul>
+</header>
+<script>
+    // 與 Instagram 相同：點擊後開啟對話框，滾動到底部時再向 API 要下一批
+    for (const link of document.querySelectorAll('.list-link')) link.addEventListener('click', event => {{
+        event.preventDefault();
+        if (document.querySelector("div[role='dialog']")) return;
+        const kind = link.dataset.kind;
+        const dialog = document.createElement('div');
+        dialog.setAttribute('role', 'dialog');
+        dialog.innerHTML = `<h3>${{link.textContent}}</h3><div class="list"></div>`;
+        document.body.appendChild(dialog);
+        const list = dialog.querySelector('.list');
+        let nextMaxId = '0';
+        let loading = false;
+
+        async function loadMore() {{
+            if (loading || nextMaxId === null) return;
+            loading = true;
+            const response = await fetch(`/api/v1/friendships/{user_id}/${{kind}}/?count={page_size}&max_id=${{nextMaxId}}`);
+            const data = await response.json();
+            for (const user of data.users) {{
+                const row = document.createElement('div');
+                row.className = 'row';
+                row.innerHTML = `<a role="link" href="/${{user.username}}/">${{user.username}}</a>`;
+                list.appendChild(row);
+            }}
+            nextMaxId = data.next_max_id;
+            loading = false;
+        }}
+
+        list.addEventListener('scroll', () => {{
+            if (list.scrollTop + list.clientHeight >= list.scrollHeight - 100) loadMore();
+        }});
+        loadMore();
+    }});
+</script>
+"""
+
+
+class FakeInstagram:
+    """模擬資料：擁有者追蹤 following 個帳號，其中約 follows_me_ratio 比例的帳號也追蹤擁有者，
+    另有 fans 個擁有者沒有追蹤的粉絲"""
+
+    def __init__(self, owner='me', password='secret', following=1000, page_size=12,
+                 latency_ms=0, follows_me_ratio=0.5, others_following=30, fans=None):
+        self.owner = owner
+        self.password = password
+        self.following = following
+        self.page_size = page_size
+        self.latency = latency_ms / 1000
+        self.follows_me_ratio = follows_me_ratio
+        self.others_following = others_following
+        self.fans = following // 10 if fans is None else fans
+        self.rpc = Counter()
+        self._lock = threading.Lock()
+
+    def username(self, index):
+        return f'user{index:05d}'
+
+    def index_of(self, username):
+        if not username.startswith('user') or not username[4:].isdigit():
+            return None
+        index = int(username[4:])
+        return index if index < self.following else None
+
+    def follows_me(self, username):
+        """以帳號編號決定是否追蹤擁有者，讓結果可以重現"""
+        index = self.index_of(username)
+        return index is not None and (index * 7919) % 100 < self.follows_me_ratio * 100
+
+    def user_id(self, username):
+        if username == self.owner:
+            return OWNER_ID
+        index = self.index_of(username)
+        return None if index is None else 1000 + index
+
+    def following_of(self, user_id):
+        """回傳某個帳號追蹤的帳號名稱"""
+        if user_id == OWNER_ID:
+            return [self.username(i) for i in range(self.following)]
+        username = self.username(user_id - 1000)
+        others = [f'other{(user_id * 31 + i) % 100000:05d}' for i in range(self.others_following)]
+        # 有追蹤擁有者時擁有者排在最前面，與 Instagram 的「共同追蹤」排序相同
+        return [self.owner] + others[1:] if self.follows_me(username) else others
+
+    def followers_of(self, user_id):
+        """回傳追蹤某個帳號的帳號名稱；只有擁有者的粉絲清單有意義"""
+        if user_id != OWNER_ID:
+            return [f'other{(user_id * 17 + i) % 100000:05d}' for i in range(self.others_following)]
+        mutual = [self.username(i) for i in range(self.following) if self.follows_me(self.username(i))]
+        fans = [f'fan{i:05d}' for i in range(self.fans)]
+        # 互相追蹤與單向粉絲交錯排列
+        merged = []
+        for index in range(max(len(mutual), len(fans))):
+            merged.extend(names[index] for names in (mutual, fans) if index < len(names))
+        return merged
+
+    def count(self, kind):
+        with self._lock:
+            self.rpc[kind] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.rpc)
+
+    def reset(self):
+        with self._lock:
+            self.rpc.clear()
+
+
+def create_fake_app(fake):
+    app = Flask(__name__)
+
+    @app.before_request
+    def simulate_latency():
+        if request.path.startswith('/__'):
+            return
+        if fake.latency:
+            time.sleep(fake.latency)
+
+    def logged_in():
+        return request.cookies.get(SESSION_COOKIE) == 'fake-session'
+
+    def page(body):
+        return PAGE.format(body=body)
+
+    @app.route('/')
+    def home():
+        fake.count('page')
+        return page(HOME if logged_in() else LOGIN_FORM)
+
+    @app.route('/accounts/login/', methods=['POST'])
+    def login():
+        fake.count('login')
+        if request.form.get('username') != fake.owner or request.form.get('password') != fake.password:
+            return page(LOGIN_FORM), 401
+        response = make_response(redirect('/'))
+        response.set_cookie(SESSION_COOKIE, 'fake-session', httponly=True)
+        return response
+
+    @app.route('/<username>/')
+    def profile(username):
+        fake.count('page')
+        if not logged_in():
+            return redirect('/')
+        user_id = fake.user_id(username)
+        if user_id is None:
+            abort(404)
+        return page(PROFILE.format(
+            username=html.escape(username),
+            user_id=user_id,
+            following=f'{len(fake.following_of(user_id)):,}',
+            followers=f'{len(fake.followers_of(user_id)):,}',
+            page_size=fake.page_size,
+        ))
+
+    @app.route('/api/v1/friendships/<int:user_id>/<any(following, followers):kind>/')
+    def friendships(user_id, kind):
+        fake.count('api')
+        if not logged_in():
+            abort(401)
+        try:
+            count = min(int(request.args.get('count', fake.page_size)), 200)
+            start = int(request.args.get('max_id') or 0)
+        except ValueError:
+            abort(400)
+        usernames = fake.following_of(user_id) if kind == 'following' else fake.followers_of(user_id)
+        batch = usernames[start:start + count]
+        end = start + len(batch)
+        return jsonify({
+            'users': [
+                {'pk': str(fake.user_id(name) or 0), 'username': name, 'full_name': ''}
+                for name in batch
+            ],
+            'big_list': end < len(usernames),
+            'page_size': count,
+            'next_max_id': str(end) if end < len(usernames) else None,
+            'status': 'ok',
+        })
+
+    @app.route('/__stats')
+    def stats():
+        return jsonify(fake.stats())
+
+    @app.route('/__reset', methods=['POST'])
+    def reset():
+        fake.reset()
+        return jsonify({})
+
+    return app
+
+
+class FakeInstagramServer:
+    """在背景執行緒啟動模擬伺服器"""
+
+    def __init__(self, fake, host='127.0.0.1', port=0):
+        self.fake = fake
+        self.server = make_server(host, port, create_fake_app(fake), threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://{self.server.host}:{self.server.port}/'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Instagram 模擬伺服器')
+    parser.add_argument('--owner', default='me')
+    parser.add_argument('--password', default='secret')
+    parser.add_argument('--following', type=int, default=1000)
+    parser.add_argument('--page-size', type=int, default=12)
+    parser.add_argument('--latency', type=float, default=0, help='每個請求的延遲（毫秒）')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    fake = FakeInstagram(args.owner, args.password, args.following, args.page_size, args.latency)
+    print(f"模擬伺服器: http://127.0.0.1:{args.port}/  帳號 {args.owner} / {args.password}")
+    create_fake_app(fake).run(host='127.0.0.1', port=args.port, threaded=True)
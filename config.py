@@ -11,20 +11,64 @@ class Config:
     # Instagram 設定
     INSTAGRAM_USERNAME = os.getenv('INSTAGRAM_USERNAME')
     INSTAGRAM_PASSWORD = os.getenv('INSTAGRAM_PASSWORD')
+    INSTAGRAM_BASE_URL = os.getenv('INSTAGRAM_BASE_URL', 'https://www.instagram.com/')  # 離線測試時指向模擬伺服器
 
     # 瀏覽器設定
     HEADLESS_MODE = os.getenv('HEADLESS_MODE', 'false').lower() == 'true'
     CHROME_DRIVER_PATH = os.getenv('CHROME_DRIVER_PATH')
+    BROWSER_PROFILE = os.getenv('BROWSER_PROFILE', 'lean')  # lean：不載入圖片、影音與字型並使用較小視窗；full：完整瀏覽器
+    CHROME_USER_DATA_DIR = os.getenv('CHROME_USER_DATA_DIR')  # 可選，保存登入狀態的瀏覽器資料目錄
+    DRIVER_CACHE_DIR = os.getenv('DRIVER_CACHE_DIR', os.path.join(BASE_DIR, 'data', 'drivers'))
+    DRIVER_OFFLINE = os.getenv('DRIVER_OFFLINE', 'false').lower() == 'true'  # 只使用快取的 ChromeDriver，不查詢網路
+    SESSION_FILE = os.getenv('SESSION_FILE', os.path.join(BASE_DIR, 'data', 'session_cookies.json'))
 
     # 資料庫設定
     DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join(BASE_DIR, 'data', 'instagram.db'))
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{DATABASE_PATH}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite 調校：WAL 讓網頁讀取不會被爬蟲寫入阻擋
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -20000))        # 負數表示 KiB
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))      # 位元組，0 表示停用
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))     # 毫秒
+    SQLITE_CRAWLER_SINGLE_WRITER = os.getenv('SQLITE_CRAWLER_SINGLE_WRITER', 'true').lower() == 'true'
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(BASE_DIR, 'data', 'snapshots'))  # 每次爬取的追蹤清單快照
+
+    # 網頁設定
+    CRAWL_GENERATION_FILE = os.getenv('CRAWL_GENERATION_FILE', os.path.join(BASE_DIR, 'data', 'crawl_generation'))
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 300))  # 首頁快取最長保留秒數
+
     # 爬蟲設定
     DELAY_BETWEEN_REQUESTS = int(os.getenv('DELAY_BETWEEN_REQUESTS', 2))
     MAX_RETRIES = int(os.getenv('MAX_RETRIES', 3))
     REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 30))
+    FOLLOWBACK_MODE = os.getenv('FOLLOWBACK_MODE', 'followers')  # followers：比對粉絲清單；profile：逐一造訪個人頁面
+    FOLLOWS_ME_TTL_HOURS = float(os.getenv('FOLLOWS_ME_TTL_HOURS', 72))  # 互相追蹤檢查結果的有效時間
+    RECHECK_SAMPLE_SIZE = int(os.getenv('RECHECK_SAMPLE_SIZE', 20))      # 每次額外輪替重新檢查的帳號數
+    # 各等待步驟的時間上限（秒），例如 "login=20,scroll=3"
+    WAIT_BUDGETS = {
+        step.strip(): float(seconds)
+        for step, seconds in (
+            item.split('=', 1) for item in os.getenv('WAIT_BUDGETS', '').split(',') if '=' in item
+        )
+    }
+    CAPTURE_MODE = os.getenv('CAPTURE_MODE', 'dom')  # dom：讀取對話框連結；network：讀取分頁 API 的回應
+    CHECK_CONCURRENCY = int(os.getenv('CHECK_CONCURRENCY', 1))  # 平行檢查互相追蹤的瀏覽器數量
+    CHECK_RATE_LIMIT = int(os.getenv('CHECK_RATE_LIMIT', 0))    # 全域每分鐘最多造訪幾個個人頁面，0 表示不限制
+
+    # 常駐模式設定（間隔以分鐘計）
+    DAEMON_SCRAPE_INTERVAL = float(os.getenv('DAEMON_SCRAPE_INTERVAL', 360))
+    DAEMON_CHECK_INTERVAL = float(os.getenv('DAEMON_CHECK_INTERVAL', 10))
+    DAEMON_CHECK_BATCH = int(os.getenv('DAEMON_CHECK_BATCH', 50))
+    DAEMON_JITTER = float(os.getenv('DAEMON_JITTER', 0.2))          # 排程間隔的隨機浮動比例
+    DAEMON_MAX_BACKOFF = float(os.getenv('DAEMON_MAX_BACKOFF', 120))  # 失敗退避的最長間隔，短於工作間隔時以工作間隔為準
+    DAEMON_STATUS_FILE = os.getenv('DAEMON_STATUS_FILE', os.path.join(BASE_DIR, 'data', 'daemon_status.json'))
+
+    # 報告設定
+    REPORT_STREAMING = os.getenv('REPORT_STREAMING', 'true').lower() == 'true'       # 分批讀取並串流寫入報告
+    REPORT_JSON_SIDECAR = os.getenv('REPORT_JSON_SIDECAR', 'false').lower() == 'true'  # 原始資料另存為 JSON 檔
 
     # 日誌設定
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
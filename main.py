@@ -1,14 +1,25 @@
 import os
-from datetime import datetime
 import logging
 from flask import Flask
 from app.crawler.instagram import InstagramCrawler
-from app.database.models import db, Following, FollowHistory
+from app.crawler.metrics import RunMetrics
+from app.crawler.pool import check_follows_me_all
+from app.database.models import db
+from app.database.engine import engine_options, configure_sqlite
+from app.database.migrations import upgrade_schema
+from app.database.reconcile import reconcile_following, store_follows_me, update_instagram_ids
+from app.database.generation import bump_generation
+from app.database.snapshots import record_snapshot
+from app.database.checkpoints import start_progress, resume_progress
+from app.database.runs import recorded_run
+from app.followback import plan_followback_checks
+from app.web.cache import GenerationCache
 from app.web.routes import web
+from app.web.api import api
 from config import config
 
-def create_app():
-    """創建 Flask 應用"""
+def create_app(crawler=False):
+    """創建 Flask 應用；crawler 為 True 時依設定使用單一長期寫入連線"""
     app = Flask(__name__)
     
     # 載入配置
@@ -25,6 +36,8 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
     print(f"Database path: {db_path}")
     print(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
+    single_writer = crawler and app.config.get('SQLITE_CRAWLER_SINGLE_WRITER', True)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config, single_writer)
     
     # 確保日誌目錄存在
     log_file = getattr(app_config, 'LOG_FILE', 'logs/app.log')
@@ -34,10 +47,16 @@ def create_app():
     # 初始化資料庫
     db.init_app(app)
     with app.app_context():
+        configure_sqlite(db.engine, app.config)
         db.create_all()
+        upgrade_schema(db.engine)
     
+    # 首頁快取，爬蟲完成後依資料世代編號失效
+    app.extensions['dashboard_cache'] = GenerationCache(app.config.get('DASHBOARD_CACHE_TTL', 300))
+
     # 註冊藍圖
     app.register_blueprint(web)
+    app.register_blueprint(api)
     
     return app
 
@@ -64,69 +83,80 @@ def setup_logger(app_config):
     
     return logger
 
-def update_following_status(crawler, app, logger):
-    """更新追蹤狀態"""
-    with app.app_context():
+def publish_results(app_config, logger):
+    """保存追蹤清單快照並通知網頁端資料已更新"""
+    # 快照供日後查詢任意時間點的狀態
+    entry = record_snapshot(app_config)
+    if entry:
+        logger.info(f"已保存追蹤快照 #{entry.number}: {entry.count} 個帳號，{entry.length} 位元組")
+    bump_generation(app_config)
+
+def update_following_status(crawler, app, logger, resume=False, run=None):
+    """更新追蹤狀態；進度保存在檢查點，resume 為 True 時從最近一次未完成的檢查點繼續
+
+    需在呼叫端的應用程式上下文中執行：爬蟲引擎以 StaticPool 共用一個連線，
+    另開上下文會產生第二個工作階段，其中的提交或還原會影響呼叫端尚未提交的執行記錄。
+    """
+    metrics = crawler.metrics
+    progress = resume_progress() if resume else None
+    if progress:
+        logger.info(f"從{progress.summary()}繼續")
+    elif resume:
+        logger.info("沒有未完成的檢查點，重新執行完整爬取")
+
+    if progress is None:
         # 獲取追蹤清單
-        following_list = crawler.get_following_list()
+        with metrics.phase('scrape'):
+            following_list = crawler.get_following_list()
         if not following_list:
             logger.error("獲取追蹤清單失敗")
             return False
+        metrics.incr('scraped', len(following_list))
 
-        # 更新所有用戶狀態為非活動
-        Following.query.update({Following.current_status: False})
-        db.session.commit()
-        
-        # 處理每個追蹤的用戶
-        for username in following_list:
-            user = Following.query.filter_by(username=username).first()
-            
-            if user:
-                # 更新現有用戶
-                if not user.current_status:
-                    # 用戶重新開始追蹤
-                    history = FollowHistory(
-                        username=username,
-                        event_type='new_follow'
-                    )
-                    db.session.add(history)
-                user.current_status = True
-                user.last_seen = datetime.utcnow()
-            else:
-                # 新用戶
-                user = Following(
-                    username=username,
-                    current_status=True
-                )
-                db.session.add(user)
-                
-                history = FollowHistory(
-                    username=username,
-                    event_type='new_follow'
-                )
-                db.session.add(history)
-            
-            db.session.commit()
-            
-            # 檢查是否互相追蹤
-            follows_me = crawler.check_follows_me(username)
-            user.follows_me = follows_me
-            db.session.commit()
-        
-        # 記錄取消追蹤的用戶
-        unfollowed_users = Following.query.filter_by(current_status=False).all()
-        for user in unfollowed_users:
-            history = FollowHistory(
-                username=user.username,
-                event_type='unfollow'
-            )
-            db.session.add(history)
-        
-        db.session.commit()
-        return True
+        # 一次比對並批次寫入追蹤狀態
+        result = reconcile_following(following_list)
+        metrics.add_time('write', result.write_seconds)
+        logger.info(f"追蹤清單比對完成: {result.summary()}")
+        if crawler.captured_users.get('following'):
+            with metrics.phase('write'):
+                update_instagram_ids(crawler.captured_users['following'])
+
+        # 保存蒐集到的清單，之後中斷時不必重新登入蒐集
+        progress = start_progress(following_list, result.added + result.reactivated, run)
 
-def run_crawler():
-    """執行爬蟲"""
+    if progress.stage == 'scraped':
+        # 先以粉絲清單判斷；需要逐一檢查時只檢查新帳號、過期的帳號和一小部分輪替抽樣
+        usernames = plan_followback_checks(crawler, app.config, progress.forced_usernames(), logger)
+        progress.save_queue(usernames)
+
+    # 檢查是否互相追蹤，由主執行緒統一分批寫入結果並記錄已檢查的帳號
+    usernames = progress.pending_usernames()
+    try:
+        with metrics.phase('check'):
+            store_follows_me(check_follows_me_all(crawler, app.config, usernames),
+                             metrics=metrics, progress=progress)
+    except BaseException:
+        # 檢查中斷前已寫入的結果也要保存快照並通知網頁端；這裡失敗只記錄，保留原本的例外
+        try:
+            publish_results(app.config, logger)
+        except Exception as e:
+            logger.error(f"保存快照或更新資料世代失敗: {str(e)}")
+        raise
+    publish_results(app.config, logger)
+    remaining = progress.pending_count()
+
+    # 無法判斷的帳號不算中斷，下次爬取時會依檢查計畫重新檢查
+    undetermined = progress.undetermined_count()
+    if undetermined:
+        logger.warning(f"{undetermined} 個帳號無法判斷是否互相追蹤，將在之後的爬取重新檢查")
+    if remaining:
+        logger.warning(f"尚有 {remaining} 個帳號未檢查，可執行 crawl --resume 繼續")
+        return False
+    progress.complete()
+    return True
+
+def run_crawler(resume=False):
+    """執行爬蟲；resume 為 True 時從上次中斷的檢查點繼續"""
     # 創建應用配置
     config_name = os.getenv('FLASK_ENV', 'development')
     app_config = config[config_name]
@@ -136,23 +166,36 @@ def run_crawler():
     logger.info("開始執行 Instagram 追蹤分析")
     
     # 創建應用
-    app = create_app()
+    app = create_app(crawler=True)
+    crawler = None
+    metrics = RunMetrics()
     
     try:
-        # 初始化爬蟲
-        crawler = InstagramCrawler(app.config)
-        crawler.init_driver()
-        
-        # 登入
-        if not crawler.login():
-            logger.error("登入失敗")
-            return
-        
-        # 更新追蹤狀態
-        if update_following_status(crawler, app, logger):
-            logger.info("追蹤狀態更新完成")
-        else:
-            logger.error("追蹤狀態更新失敗")
+        # 每次執行的各階段耗時記錄在 crawl_runs
+        with app.app_context(), recorded_run('crawl', metrics) as run:
+            # 初始化爬蟲
+            crawler = InstagramCrawler(app.config)
+            crawler.metrics = metrics
+            crawler.init_driver()
+            
+            # 登入
+            with metrics.phase('login'):
+                logged_in = crawler.login()
+            if not logged_in:
+                logger.error("登入失敗")
+                run.status, run.error = 'failed', "登入失敗"
+                return
+            
+            # 更新追蹤狀態
+            updated = update_following_status(crawler, app, logger, resume, run)
+            # 最後一個頁面的傳輸量在離開頁面時才結算
+            crawler.finish_page()
+            if updated:
+                logger.info("追蹤狀態更新完成")
+            else:
+                logger.error("追蹤狀態更新失敗")
+                run.status, run.error = 'failed', "追蹤狀態更新失敗"
+        logger.info(f"執行統計: {metrics.summary()}")
             
     except Exception as e:
         logger.error(f"執行過程中發生錯誤: {str(e)}")
@@ -163,6 +206,14 @@ def run_crawler():
             crawler.close()
             logger.info("已關閉瀏覽器")
 
+def run_daemon():
+    """以常駐模式依排程執行爬蟲"""
+    from app.daemon import CrawlerDaemon
+
+    app = create_app(crawler=True)
+    logger = setup_logger(app.config)
+    CrawlerDaemon(app, logger).run_forever()
+
 def test_check_follows_me(username):
     """測試特定帳號的追蹤檢查"""
     app = create_app()  # 創建應用以獲得正確的配置
@@ -178,7 +229,10 @@ def test_check_follows_me(username):
             return
         
         result = crawler.check_follows_me(username)
-        logger.info(f"測試結果: {username} {'有' if result else '沒有'}追蹤我")
+        if result is None:
+            logger.warning(f"測試結果: 無法判斷 {username} 是否追蹤我")
+        else:
+            logger.info(f"測試結果: {username} {'有' if result else '沒有'}追蹤我")
         
     except Exception as e:
         logger.error(f"測試過程中發生錯誤: {str(e)}")
@@ -188,7 +242,7 @@ def test_check_follows_me(username):
         if crawler:
             crawler.close()
 
-def generate_static_report(app_config, output_path=None):
+def generate_static_report(app_config, output_path=None, force=False):
     """生成靜態HTML報告"""
     from app.report.generator import ReportGenerator
     
@@ -200,8 +254,14 @@ def generate_static_report(app_config, output_path=None):
         generator = ReportGenerator(app)
         
         # 生成報告
-        report_path = generator.generate_report(output_path) if output_path else generator.generate_report()
-        print(f"報告已生成: {report_path}")
+        if output_path:
+            report_path = generator.generate_report(output_path, force=force)
+        else:
+            report_path = generator.generate_report(force=force)
+        if generator.last_run['skipped']:
+            print(f"資料未變動，沿用現有報告: {report_path}")
+        else:
+            print(f"報告已生成: {report_path}（重新渲染: {', '.join(generator.last_run['rendered'])}）")
         
         # 在瀏覽器中打開報告
         import webbrowser
@@ -211,6 +271,72 @@ def generate_static_report(app_config, output_path=None):
         print(f"生成報告時發生錯誤: {str(e)}")
         return False
 
+def compact_history_command():
+    """清理重複的追蹤事件"""
+    from app.database.maintenance import compact_history
+
+    app = create_app()
+    with app.app_context():
+        removed = compact_history()
+    bump_generation(app.config)
+    print(f"已移除 {removed} 筆重複的追蹤事件")
+
+def parse_snapshot_time(value):
+    """解析 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM（UTC），只有日期時取當天結束前的最後一次快照"""
+    from datetime import datetime, timedelta
+
+    moment = datetime.fromisoformat(value)
+    if len(value) <= 10:
+        moment += timedelta(days=1) - timedelta(microseconds=1)
+    return moment
+
+def snapshot_command(args):
+    """查詢追蹤清單快照"""
+    from app.database.snapshots import snapshot_store, usernames_for
+
+    app = create_app()
+    store = snapshot_store(app.config)
+    if not store:
+        print("未設定 SNAPSHOT_DIR")
+        return
+
+    if not args or args[0] == 'list':
+        for entry in store.entries():
+            print(f"#{entry.number}  {entry.taken_at:%Y-%m-%d %H:%M:%S}  {entry.count} 個帳號  {entry.length} 位元組")
+        return
+
+    try:
+        moments = [parse_snapshot_time(value) for value in args[1:3]]
+    except ValueError:
+        print(f"無法解析時間: {' '.join(args[1:3])}（格式為 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM）")
+        return
+
+    with app.app_context():
+        if args[0] == 'show' and len(args) > 1:
+            snapshot = store.at(moments[0])
+            if not snapshot:
+                print("該時間點之前沒有快照")
+                return
+            mutual = set(snapshot.mutual_ids())
+            print(f"快照 #{snapshot.entry.number} ({snapshot.taken_at:%Y-%m-%d %H:%M:%S})，共 {len(snapshot)} 個帳號")
+            for user_id, username in zip(snapshot.ids, usernames_for(snapshot.ids)):
+                print(f"  {username}{'  (互相追蹤)' if user_id in mutual else ''}")
+        elif args[0] == 'diff' and len(args) > 2:
+            before = store.at(moments[0])
+            after = store.at(moments[1])
+            if not before or not after:
+                print("該時間點之前沒有快照")
+                return
+            diff = store.diff(before, after)
+            print(f"快照 #{before.entry.number} → #{after.entry.number}: {diff.summary()}")
+            for label, ids in (('+', diff.added), ('-', diff.removed),
+                               ('開始互相追蹤', diff.started_following),
+                               ('不再互相追蹤', diff.stopped_following)):
+                for username in usernames_for(ids):
+                    print(f"  {label} {username}")
+        else:
+            print("用法: snapshot [list | show <時間> | diff <時間1> <時間2>]")
+
 def main():
     """主程式"""
     import sys
@@ -222,20 +348,37 @@ def main():
         
         if sys.argv[1] == 'crawl':
             # 執行爬蟲
-            run_crawler()
+            run_crawler(resume='--resume' in sys.argv[2:])
+        elif sys.argv[1] == 'daemon':
+            # 常駐模式
+            run_daemon()
         elif sys.argv[1] == 'test' and len(sys.argv) > 2:
             # 測試特定帳號
             test_check_follows_me(sys.argv[2])
         elif sys.argv[1] == 'generate-report':
             # 生成靜態報告
-            output_path = sys.argv[2] if len(sys.argv) > 2 else None
-            generate_static_report(app_config, output_path)
+            args = [arg for arg in sys.argv[2:] if arg != '--force']
+            output_path = args[0] if args else None
+            generate_static_report(app_config, output_path, force='--force' in sys.argv[2:])
+        elif sys.argv[1] == 'snapshot':
+            # 查詢追蹤清單快照
+            snapshot_command(sys.argv[2:])
+        elif sys.argv[1] == 'compact-history':
+            # 清理重複的追蹤事件
+            compact_history_command()
         else:
             print("可用命令:")
             print("  crawl              - 執行 Instagram 追蹤分析爬蟲")
+            print("  crawl --resume     - 從上次中斷的地方繼續爬蟲")
+            print("  daemon             - 常駐執行，依排程蒐集清單與檢查互相追蹤")
             print("  test <username>    - 測試檢查特定帳號是否互相追蹤")
             print("  generate-report    - 生成靜態 HTML 報告")
             print("  generate-report <output_path>  - 生成報告到指定路徑")
+            print("  generate-report --force        - 忽略快取，重新渲染整份報告")
+            print("  compact-history    - 移除重複記錄的追蹤事件")
+            print("  snapshot list      - 列出已保存的追蹤清單快照")
+            print("  snapshot show <時間>           - 顯示該時間點的追蹤清單")
+            print("  snapshot diff <時間1> <時間2>  - 比較兩個時間點的追蹤清單")
     else:
         # 啟動網頁服務
         app = create_app()